@@ -0,0 +1,80 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def get_choice_columns(data_df, q_code):
+    """
+    Method to find the columns of the options of a multiple choice question, e.g. AWA2[SQ001], AWA2[SQ002], ...
+    The comment and other fields are left out.
+    :param DataFrame data_df: raw survey data or the processed data (with 2-level header)
+    :param string q_code: code of the multiple choice question, e.g. AWA2
+    :return: dict {column name: option code} in the order of the columns
+    """
+    pattern = re.compile(re.escape(q_code) + r"\[([^\]]+)\]$")
+    codes = data_df.columns.get_level_values(0) if isinstance(data_df.columns, pd.MultiIndex) else data_df.columns
+
+    columns = {}
+    for code in codes.unique():
+        match = pattern.match(code)
+        if match and 'comment' not in match.group(1) and 'other' not in match.group(1):
+            columns[code] = match.group(1)
+    return columns
+
+
+def make_choice_matrix(data_df, q_code):
+    """
+    Method to bring a multiple choice question (with or without comments) into a boolean
+    (participants x options) matrix: True if the participant ticked the option.
+    :param DataFrame data_df: raw survey data ('Y' for ticked) or the processed data (1 in the 'a' subcolumns)
+    :param string q_code: code of the multiple choice question, e.g. AWA2
+    :return: boolean DataFrame with the participants as index and the option codes (e.g. SQ001) as columns
+    """
+    columns = get_choice_columns(data_df, q_code)
+    if not columns:
+        raise Exception('There are no option columns for this question.', q_code)
+
+    if isinstance(data_df.columns, pd.MultiIndex):
+        values = data_df[[(column, 'a') for column in columns]].apply(pd.to_numeric).to_numpy() == 1
+    else:
+        values = data_df[list(columns)].astype(object).to_numpy() == 'Y'
+
+    return pd.DataFrame(values, index=data_df.index, columns=list(columns.values()))
+
+
+def pack_choice_matrix(choice_matrix):
+    """
+    Packs a choice matrix into one bitmask per participant (8 options per byte)
+    :param DataFrame choice_matrix: as it falls out of make_choice_matrix()
+    :return: uint8 array with shape (participants, ceil(options / 8))
+    """
+    return np.packbits(choice_matrix.to_numpy(dtype=bool), axis=1)
+
+
+def unpack_choice_matrix(bitmasks, options, index=None):
+    """
+    Inverse of pack_choice_matrix()
+    :param ndarray bitmasks: as it falls out of pack_choice_matrix()
+    :param list options: the option codes, in the order of the columns of the original choice matrix
+    :param index: participant index for the result
+    :return: boolean DataFrame
+    """
+    values = np.unpackbits(bitmasks, axis=1, count=len(options)).astype(bool)
+    return pd.DataFrame(values, index=index, columns=options)
+
+
+def calculate_cooccurrence(data_df, q_code, other_q_code=None):
+    """
+    Counts how many participants ticked two options together. Within one question, the diagonal holds how often
+    each option was ticked at all. With a second question, it counts the combinations across both questions.
+    :param DataFrame data_df: raw survey data or the processed data
+    :param string q_code: code of the multiple choice question for the rows
+    :param string other_q_code: code of the multiple choice question for the columns, None for q_code itself
+    :return: DataFrame with the options of q_code as index and the ones of other_q_code as columns
+    """
+    rows = make_choice_matrix(data_df, q_code)
+    columns = rows if other_q_code is None else make_choice_matrix(data_df, other_q_code)
+
+    counts = rows.to_numpy(dtype=np.int32).T @ columns.to_numpy(dtype=np.int32)
+    return pd.DataFrame(counts, index=rows.columns, columns=columns.columns)
@@ -0,0 +1,103 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def get_rank_columns(data_df, q_code):
+    """
+    Method to find the columns of a ranking question. Lime Survey names them by rank position: IMP5[1], IMP5[2], ...
+    :param DataFrame data_df: raw survey data or the processed data (with 2-level header)
+    :param string q_code: code of the ranking question, e.g. IMP5
+    :return: list of the column names ordered by rank
+    """
+    pattern = re.compile(re.escape(q_code) + r"\[(\d+)\]$")
+    codes = data_df.columns.get_level_values(0) if isinstance(data_df.columns, pd.MultiIndex) else data_df.columns
+
+    columns = {}
+    for code in codes.unique():
+        match = pattern.match(code)
+        if match:
+            columns[int(match.group(1))] = code
+    return [columns[rank] for rank in sorted(columns)]
+
+
+def make_rank_matrix(data_df, q_code, options=None):
+    """
+    Turns the rank position columns of a ranking question into a (participants x options) matrix that holds the
+    rank every participant gave to every option (1: highest). Options a participant did not rank are NaN.
+    :param DataFrame data_df: raw survey data (answer codes like A1) or the processed data (integers in the 'a'
+        subcolumns)
+    :param string q_code: code of the ranking question, e.g. IMP5
+    :param list options: the options (answer codes or integers) in the order they should appear in the matrix.
+        If None, all options that were ranked by anyone are used.
+    :return: DataFrame with the participants as index and the options as columns
+    """
+    columns = get_rank_columns(data_df, q_code)
+    if not columns:
+        raise Exception('There are no rank columns for this question.', q_code)
+
+    if isinstance(data_df.columns, pd.MultiIndex):
+        values = data_df[[(column, 'a') for column in columns]].apply(pd.to_numeric).to_numpy()
+        if options is None:
+            options = sorted(int(option) for option in pd.unique(values[~np.isnan(values)]))
+    else:
+        values = data_df[columns].astype(object).to_numpy()
+        if options is None:
+            options = sorted(pd.unique(values[pd.notna(values)]))
+
+    # position of the option in options for every cell, -1 where nothing (or something unknown) was ranked
+    option_index = pd.Categorical(values.ravel(), categories=options).codes.reshape(values.shape)
+
+    ranks = np.full((values.shape[0], len(options)), np.nan)
+    participants, positions = np.nonzero(option_index >= 0)
+    ranks[participants, option_index[participants, positions]] = positions + 1
+
+    return pd.DataFrame(ranks, index=data_df.index, columns=options)
+
+
+def calculate_mean_rank(rank_matrix):
+    """
+    Mean rank per option over the participants that ranked it (lower is better)
+    :param DataFrame rank_matrix: as it falls out of make_rank_matrix()
+    :return: Series with the mean rank per option
+    """
+    return rank_matrix.mean()
+
+
+def calculate_borda_scores(rank_matrix):
+    """
+    Borda count per option: with N options, rank 1 gives N-1 points, rank 2 N-2 and so on.
+    Unranked options get no points.
+    :param DataFrame rank_matrix: as it falls out of make_rank_matrix()
+    :return: Series with the Borda score per option
+    """
+    points = rank_matrix.shape[1] - rank_matrix.to_numpy()
+    return pd.Series(np.nansum(points, axis=0), index=rank_matrix.columns)
+
+
+def calculate_top_k_frequencies(rank_matrix, k, relative_frequencies=False):
+    """
+    How often every option was ranked among the first k
+    :param DataFrame rank_matrix: as it falls out of make_rank_matrix()
+    :param int k: number of top positions to consider
+    :param bool relative_frequencies: If we want the share of participants that ranked anything (otherwise counts)
+    :return: Series with the frequency per option
+    """
+    ranks = rank_matrix.to_numpy()
+    counts = np.sum(ranks <= k, axis=0)
+    if relative_frequencies:
+        counts = counts / max(np.sum(np.any(~np.isnan(ranks), axis=1)), 1)
+    return pd.Series(counts, index=rank_matrix.columns)
+
+
+def calculate_pairwise_preferences(rank_matrix):
+    """
+    Pairwise preference matrix: entry (i, j) counts the participants that put option i above option j.
+    An option that was ranked counts as above all options that were not ranked.
+    :param DataFrame rank_matrix: as it falls out of make_rank_matrix()
+    :return: DataFrame with the options as index and as columns
+    """
+    ranks = np.nan_to_num(rank_matrix.to_numpy(), nan=np.inf)
+    preferences = np.sum(ranks[:, :, np.newaxis] < ranks[:, np.newaxis, :], axis=0)
+    return pd.DataFrame(preferences, index=rank_matrix.columns, columns=rank_matrix.columns)
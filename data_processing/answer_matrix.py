@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_processing.processor import CHOICE_QUESTION_TYPES
+
+
+def index_path(path):
+    """
+    The sidecar file with participant ids and column codes lives next to the matrix: answers.npy -> answers.index.json
+    :param str path: path of the matrix file
+    :return Path: path of the index file
+    """
+    path = Path(path)
+    return path.with_name(path.stem + '.index.json')
+
+
+def write_answer_matrix(user_output, question_mapping_df, path):
+    """
+    Function to write all machine readable answers (the 'a' subcolumns) of a processed survey as a dense integer
+    matrix into a .npy file that can be memory-mapped. Missing answers are stored as the smallest value of the dtype.
+    Only the questions with answer codes (see CHOICE_QUESTION_TYPES) are written, free text 'a' columns are left out
+    even if their answers happen to be numbers.
+    :param DataFrame user_output: processed data as it falls out of SurveyProcessor.process_user_input()
+    :param DataFrame question_mapping_df: A df holding a mapping from question code to corresponding type and text,
+        as it falls out of SurveyProcessor.create_question_overview_df()
+    :param str path: Path to where the matrix should be written (e.g. "answers.npy")
+    :return list of str: the codes of the columns in the matrix
+    """
+    question_types = question_mapping_df.loc['Question Type']
+
+    # collect the 'a' columns of all choice questions
+    numeric = {}
+    for code, version in user_output.columns:
+        if version == 'a' and question_types.get(code) in CHOICE_QUESTION_TYPES:
+            numeric[code] = pd.to_numeric(user_output[(code, version)])
+
+    # pick the smallest dtype that can hold all answers, its minimum is reserved to mark missing answers
+    lowest = min([values.min() for values in numeric.values() if values.notna().any()], default=0)
+    highest = max([values.max() for values in numeric.values() if values.notna().any()], default=0)
+    for dtype in [np.int8, np.int16]:
+        info = np.iinfo(dtype)
+        if info.min < lowest and highest <= info.max:
+            break
+    else:
+        raise Exception('The answers do not fit into an int16 matrix.', lowest, highest)
+    missing = int(np.iinfo(dtype).min)
+
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(len(user_output), len(numeric)))
+    for j, values in enumerate(numeric.values()):
+        matrix[:, j] = values.fillna(missing).to_numpy(dtype=dtype)
+    matrix.flush()
+    del matrix
+
+    # participant ids come out of Lime Survey as numbers, but pandas may have turned them into floats
+    ids = [int(i) if isinstance(i, float) and i.is_integer() else i for i in user_output.index.tolist()]
+    index = {'ids': ids, 'columns': list(numeric.keys()), 'dtype': np.dtype(dtype).name, 'missing': missing}
+    with open(index_path(path), 'w') as f:
+        json.dump(index, f)
+
+    return index['columns']
+
+
+class AnswerMatrix():
+    """
+    Read-only access to a matrix written by write_answer_matrix(). The matrix is memory-mapped, so it is not read
+    into memory and several processes that open the same file share one copy of it.
+    """
+
+    def __init__(self, path):
+        """
+        Initialization
+        :param str path: Path of the .npy file
+        """
+        with open(index_path(path)) as f:
+            index = json.load(f)
+        self.ids = index['ids']
+        self.columns = index['columns']
+        self.missing = index['missing']
+        self.matrix = np.load(path, mmap_mode='r')
+
+        self.column_positions = {code: j for j, code in enumerate(self.columns)}
+
+    def column(self, code):
+        """
+        Method to obtain the answers to one (sub)question without copying them
+        :param str code: Code of the column, e.g. AWA2[SQ001]
+        :return ndarray: the answers, missing ones are marked with self.missing
+        """
+        return self.matrix[:, self.column_positions[code]]
+
+    def is_missing(self, code=None):
+        """
+        Method to obtain a boolean mask of the missing answers
+        :param str code: Code of the column or None for the whole matrix
+        :return ndarray: True where the answer is missing
+        """
+        values = self.matrix if code is None else self.column(code)
+        return values == self.missing
+
+    def to_frame(self, columns=None):
+        """
+        Method to load (some of) the columns into a DataFrame with NaN for missing answers. This copies the data.
+        :param list of str columns: codes of the columns to load, None for all
+        :return DataFrame: the answers with the participant ids as index
+        """
+        if columns is None:
+            columns = self.columns
+        positions = [self.column_positions[code] for code in columns]
+        values = self.matrix[:, positions].astype(float)
+        values[values == self.missing] = np.nan
+        return pd.DataFrame(values, index=pd.Index(self.ids, name='id'), columns=columns)
@@ -0,0 +1,178 @@
+import asyncio
+import base64
+import codecs
+
+import aiohttp
+
+from data_processing.response_parser import make_response_dtypes, parse_responses
+
+# same endpoint that limepy uses for the RemoteControl 2 API
+ENDPOINT = '{}/index.php/admin/remotecontrol'
+
+
+class AsyncDownloader():
+    """
+    The async downloader fetches the responses (and optionally the .lss survey structure) of several surveys
+    at once. All requests go over one pooled HTTP session to the Lime Survey RemoteControl JSON-RPC API.
+    """
+    def __init__(self, url, username, password, userid, surveyids, max_concurrency=4, retries=3, backoff=0.5,
+                 timeout=60):
+        """
+        Initialization
+        :param str url: Base url of the Lime Survey instance (the RemoteControl endpoint is appended)
+        :param str username: Lime Survey user name
+        :param str password: Lime Survey password
+        :param int userid: Lime Survey user id (used as JSON-RPC request id, like limepy does)
+        :param list of int surveyids: The ids of all surveys (waves, language variants) to fetch
+        :param int max_concurrency: How many requests may be in flight at the same time
+        :param int retries: How often a failed request is repeated before giving up
+        :param float backoff: Seconds to wait before the first retry, doubled with every further retry
+        :param float timeout: Total timeout of a single request in seconds
+        """
+        self.url = url
+        self.username = username
+        self.password = password
+        self.userid = userid
+        self.surveyids = list(surveyids)
+
+        if max_concurrency < 1:
+            raise Exception("max_concurrency needs to be at least 1.")
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    async def call(self, session, semaphore, method, params):
+        """
+        Method to send one JSON-RPC call to the RemoteControl API. Network errors and server errors (5xx)
+        are retried with exponential backoff.
+        :param ClientSession session: The pooled http session
+        :param Semaphore semaphore: Limits the number of concurrent requests
+        :param str method: Name of the RemoteControl method
+        :param list params: Parameters of the method
+        :return: The 'result' field of the answer
+        """
+        api_url = ENDPOINT.format(self.url)
+        payload = {'method': method, 'params': params, 'id': self.userid}
+
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    async with session.post(api_url, json=payload) as response:
+                        response.raise_for_status()
+                        answer = await response.json(content_type=None)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # client errors (4xx) will not go away by asking again
+                if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                    raise
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+        if answer.get('error'):
+            raise Exception('The RemoteControl API returned an error.', method, answer['error'])
+
+        result = answer['result']
+        # Lime Survey reports failures as {'status': 'some message'} instead of a JSON-RPC error
+        if isinstance(result, dict) and 'status' in result:
+            raise Exception('The RemoteControl API call failed.', method, result['status'])
+        return result
+
+    async def get_session_key(self, session, semaphore):
+        """
+        Method to log in and obtain a session key that is shared by all following calls.
+        :return str: session key
+        """
+        return await self.call(session, semaphore, 'get_session_key', [self.username, self.password])
+
+    async def release_session_key(self, session, semaphore, session_key):
+        """
+        Method to log out again.
+        """
+        return await self.call(session, semaphore, 'release_session_key', [session_key])
+
+    async def fetch_responses(self, session, semaphore, session_key, surveyid):
+        """
+        Method to download the responses of one survey as CSV export with question codes as headers.
+        :param int surveyid: The id of the survey
+        :return bytes: The raw CSV export (utf-8, without byte order mark)
+        """
+        result = await self.call(session, semaphore, 'export_responses',
+                                 [session_key, surveyid, 'csv', None, 'all', 'code', 'short'])
+        data = base64.b64decode(result)
+        if data.startswith(codecs.BOM_UTF8):
+            data = data[len(codecs.BOM_UTF8):]
+        return data
+
+    async def fetch_structure(self, session, semaphore, session_key, surveyid):
+        """
+        Method to download the survey structure of one survey as .lss.
+        This needs a Lime Survey version whose RemoteControl API offers 'export_survey'.
+        :param int surveyid: The id of the survey
+        :return str: Survey Structure
+        """
+        result = await self.call(session, semaphore, 'export_survey', [session_key, surveyid, 'lss'])
+        return base64.b64decode(result).decode('utf-8-sig')
+
+    async def download_all_async(self, with_structure=False):
+        """
+        Coroutine that downloads all surveys concurrently.
+        :param bool with_structure: If true, the .lss structures are fetched as well
+        :return dict: {surveyid: raw csv bytes} and, if with_structure, a second dict {surveyid: structure}
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            session_key = await self.get_session_key(session, semaphore)
+            try:
+                jobs = [self.fetch_responses(session, semaphore, session_key, sid) for sid in self.surveyids]
+                if with_structure:
+                    jobs += [self.fetch_structure(session, semaphore, session_key, sid) for sid in self.surveyids]
+                results = await asyncio.gather(*jobs)
+            finally:
+                await self.release_session_key(session, semaphore, session_key)
+
+        n = len(self.surveyids)
+        responses = dict(zip(self.surveyids, results[:n]))
+        if with_structure:
+            return responses, dict(zip(self.surveyids, results[n:]))
+        return responses
+
+    def download_raw(self, with_structure=False):
+        """
+        Blocking wrapper around download_all_async() for the use outside of an event loop.
+        :return dict: see download_all_async()
+        """
+        return asyncio.run(self.download_all_async(with_structure))
+
+    def download_data(self, with_structure=False, structures=None, engine=None, string_storage=None):
+        """
+        A method to download the data of all surveys, like Downloader.download_data does it for a single survey.
+        The exports are parsed straight from the downloaded bytes.
+        :param bool with_structure: If true, the .lss structures are downloaded and returned as well
+        :param dict structures: {surveyid: Survey Structure} used to type the columns. Downloaded structures are
+            used if with_structure is set. Surveys without a structure get inferred dtypes.
+        :param str engine: pandas csv engine, e.g. 'pyarrow'. None for the default.
+        :param str string_storage: 'pyarrow' to keep the text columns as Arrow-backed strings, None for objects
+        :return dict of DataFrame: {surveyid: raw data} and, if with_structure, {surveyid: structure}
+        """
+        result = self.download_raw(with_structure)
+        if with_structure:
+            responses, structures = result
+        else:
+            responses = result
+        structures = structures or {}
+
+        frames = {}
+        for sid, data in responses.items():
+            dtypes = make_response_dtypes(structures[sid]) if sid in structures else None
+            frames[sid] = parse_responses(data, dtypes, engine, string_storage)
+
+        if with_structure:
+            return frames, structures
+        return frames
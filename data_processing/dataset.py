@@ -0,0 +1,168 @@
+from limepy.wrangle import Survey
+
+from data_processing.processor import SurveyProcessor
+from data_visualization.plotter import Plotter
+
+
+class SurveyDataset():
+    """
+    A class that bundles the raw responses and the structure of a survey with everything that is derived from them:
+    the processed responses, the answer mapping, the question overview and the labels of every question.
+    Each of them is computed when it is first used and kept afterwards. When new responses arrive or the structure
+    changes, only what depends on the changed input is computed again, e.g. new responses keep the answer mapping.
+    """
+
+    # what every derived value is computed from, inputs are 'raw_responses' and 'structure'
+    DEPENDENCIES = {
+        'survey': ['raw_responses', 'structure'],
+        'processor': ['survey'],
+        'responses': ['raw_responses', 'structure'],
+        'answer_mapping': ['structure'],
+        'question_overview': ['structure'],
+        'label_index': ['answer_mapping'],
+    }
+
+    def __init__(self, raw_responses, structure, processor_class=SurveyProcessor, completed_only=True,
+                 at_least_answer=None, string_storage=None, cache=None):
+        """
+        Initialization
+        :param DataFrame raw_responses: The responses as they come from the download
+        :param str structure: Survey Structure (content of the .lss file)
+        :param class processor_class: SurveyProcessor or a subclass of it for a concrete survey
+        :param bool completed_only: see SurveyProcessor.process_user_input()
+        :param int at_least_answer: see SurveyProcessor.process_user_input()
+        :param str string_storage: see SurveyProcessor.process_user_input()
+        :param ResultCache cache: If given, the processed responses are read from / written to this cache
+        """
+        self.raw_responses = raw_responses
+        self.structure = structure
+        self.processor_class = processor_class
+        self.completed_only = completed_only
+        self.at_least_answer = at_least_answer
+        self.string_storage = string_storage
+        self.cache = cache
+
+        self.values = {}  # name -> computed value
+
+    @classmethod
+    def from_downloader(cls, downloader, **kwargs):
+        """
+        Method to create a dataset from the data of a Downloader
+        :param Downloader downloader: The downloader of the survey
+        :param kwargs: see __init__()
+        :return SurveyDataset: the dataset
+        """
+        structure = downloader.load_survey_structure()
+        return cls(downloader.download_data(structure, string_storage=kwargs.get('string_storage')), structure,
+                   **kwargs)
+
+    def invalidate(self, name):
+        """
+        Method to drop everything that depends (directly or through other values) on name
+        :param str name: an input or a derived value
+        """
+        self.values.pop(name, None)
+        for dependent, dependencies in self.DEPENDENCIES.items():
+            if name in dependencies:
+                self.invalidate(dependent)
+
+    def set_responses(self, raw_responses):
+        """
+        Method to replace the raw responses, e.g. after a new download
+        :param DataFrame raw_responses: The responses as they come from the download
+        """
+        self.raw_responses = raw_responses
+        self.invalidate('raw_responses')
+
+    def set_structure(self, structure):
+        """
+        Method to replace the survey structure
+        :param str structure: Survey Structure (content of the .lss file)
+        """
+        self.structure = structure
+        self.invalidate('structure')
+
+    def get(self, name):
+        """
+        Helper to return a derived value, it is computed by compute_<name>() if it is not known yet
+        :param str name: name of the value, see DEPENDENCIES
+        """
+        if name not in self.values:
+            self.values[name] = getattr(self, 'compute_' + name)()
+        return self.values[name]
+
+    def compute_survey(self):
+        return Survey(self.raw_responses, self.structure)
+
+    def compute_processor(self):
+        return self.processor_class(self.survey)
+
+    def compute_responses(self):
+        if self.cache is not None:
+            return self.cache.process_user_input(self.processor, self.structure, self.completed_only,
+                                                 self.at_least_answer, string_storage=self.string_storage)
+        return self.processor.process_user_input(self.completed_only, self.at_least_answer,
+                                                 string_storage=self.string_storage)
+
+    def compute_answer_mapping(self):
+        # mapping from (question code, int) to text, as the Plotter and the analysis functions expect it
+        return self.processor.make_answer_code_to_text_mapping_df(a_code=False)
+
+    def compute_question_overview(self):
+        return self.processor.create_question_overview_df()
+
+    def compute_label_index(self):
+        # the answer texts of every question in one pass, like data_analysis.analysis.get_data_labels() for each
+        label_index = {}
+        for (q_code, _), text in self.answer_mapping.iloc[0].items():
+            label_index.setdefault(q_code, []).append(text)
+        return label_index
+
+    @property
+    def survey(self):
+        """
+        :return Survey: the limepy survey of the raw responses and the structure
+        """
+        return self.get('survey')
+
+    @property
+    def processor(self):
+        """
+        :return SurveyProcessor: the processor of the survey
+        """
+        return self.get('processor')
+
+    @property
+    def responses(self):
+        """
+        :return DataFrame: the processed responses as they fall out of SurveyProcessor.process_user_input()
+        """
+        return self.get('responses')
+
+    @property
+    def answer_mapping(self):
+        """
+        :return DataFrame: the mapping from (question code, answer int) to the answer text
+        """
+        return self.get('answer_mapping')
+
+    @property
+    def question_overview(self):
+        """
+        :return DataFrame: the mapping from question code to question text and type
+        """
+        return self.get('question_overview')
+
+    @property
+    def label_index(self):
+        """
+        :return dict: {question code: list of all answer texts in the order of the answer codes}
+        """
+        return self.get('label_index')
+
+    def plotter(self):
+        """
+        Method to create a Plotter with the answer mapping and question overview of this dataset
+        :return Plotter: the plotter
+        """
+        return Plotter(self.answer_mapping, self.question_overview)
@@ -1,14 +1,14 @@
 from pathlib import Path
 from limepy import download
 from limepy.wrangle import Survey
-from io import StringIO
-import pandas as pd
+from data_processing.memory_tracker import tracked
+from data_processing.response_parser import make_response_dtypes, parse_responses
 
 class Downloader():
     """
     The downloader class serves as a method to access the limepy API
     """
-    def __init__(self, url, username, password, userid, surveyid, lsspath):
+    def __init__(self, url, username, password, userid, surveyid, lsspath, memory_tracker=None):
         self.url = url
         self.username = username
         self.password = password
@@ -18,15 +18,29 @@ class Downloader():
         if not lsspath.endswith('.lss'):
             raise Exception("You need to specify the path to a lss file with the survey structure.")
         self.lsspath = lsspath  # path to the lss file with survey structure
+        self.memory_tracker = memory_tracker  # MemoryTracker to record the memory of the downloads, None for no tracking
 
-    def download_data(self):
+    @tracked
+    def download_data(self, structure=None, typed=True, engine=None, string_storage=None):
         """
         A method to download the data over the Lime Survey API.
+        :param str structure: Survey Structure used to type the columns. If None, the lss file is loaded.
+        :param bool typed: If true, the column dtypes are derived from the survey structure
+            (categorical answer codes, datetime and small int metadata), otherwise pandas infers them
+        :param str engine: pandas csv engine, e.g. 'pyarrow'. None for the default.
+        :param str string_storage: 'pyarrow' to keep the text columns as Arrow-backed strings, None for objects
         :return DataFrame data: returns the raw data
         """
 
         data = download.get_responses(self.url, self.username, self.password, self.userid, self.surveyid)
-        data_df = pd.read_csv(StringIO(data), sep=';')
+
+        dtypes = None
+        if typed:
+            if structure is None:
+                structure = self.load_survey_structure()
+            dtypes = make_response_dtypes(structure)
+
+        data_df = parse_responses(data, dtypes, engine, string_storage)
         return data_df
 
     def write_data_as_csv(self, data, path):
@@ -48,14 +62,15 @@ class Downloader():
         my_structure = open(self.lsspath).read()
         return my_structure
 
+    @tracked
     def create_survey(self):
         """
         Method to create a survey object.
         :return Survey survey: The survey object with all the data
         """
 
-        data = self.download_data()
         structure = self.load_survey_structure()
+        data = self.download_data(structure)
 
         survey = Survey(data, structure)
         return survey
@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import codecs
+import uuid
+
+from aiohttp import web
+
+from data_processing.async_downloader import ENDPOINT
+
+
+class FakeRemoteControl():
+    """
+    A local stand-in for the Lime Survey RemoteControl JSON-RPC API. It serves the methods the downloaders use
+    from in-memory data so that downloading can be tried out and tested without a Lime Survey instance.
+    """
+
+    def __init__(self, responses, structures=None, username='admin', password='password', delay=0.0,
+                 fail_first=0):
+        """
+        Initialization
+        :param dict responses: {surveyid: csv export as str} with ';' as separator and question codes as header
+        :param dict structures: {surveyid: content of the .lss file}
+        :param str username: User name that is accepted by get_session_key
+        :param str password: Password that is accepted by get_session_key
+        :param float delay: Seconds every export call takes, to imitate a slow server
+        :param int fail_first: Number of requests that are answered with a 503 before the server behaves,
+            to check the retries of the client
+        """
+        self.responses = {str(sid): data for sid, data in responses.items()}
+        self.structures = {str(sid): data for sid, data in (structures or {}).items()}
+        self.username = username
+        self.password = password
+        self.delay = delay
+        self.fail_first = fail_first
+
+        self.session_keys = set()
+        self.calls = []  # every method that has been called, in order
+        self.in_flight = 0
+        self.max_in_flight = 0  # highest number of requests handled at the same time
+
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        """
+        Request handler that dispatches the JSON-RPC call to the method of the same name.
+        """
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            return web.Response(status=503)
+
+        payload = await request.json()
+        method = payload['method']
+        params = payload['params']
+        self.calls.append(method)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if method == 'get_session_key':
+                result = self.get_session_key(*params[:2])
+            elif method == 'release_session_key':
+                self.session_keys.discard(params[0])
+                result = 'OK'
+            elif params[0] not in self.session_keys:
+                result = {'status': 'Invalid session key'}
+            elif method == 'export_responses':
+                await asyncio.sleep(self.delay)
+                result = self.export(self.responses, params[1], 'No Data, survey table does not exist.')
+            elif method == 'export_survey':
+                await asyncio.sleep(self.delay)
+                result = self.export(self.structures, params[1], 'Invalid survey ID')
+            else:
+                return web.json_response({'id': payload.get('id'), 'result': None,
+                                          'error': 'Method not implemented: ' + method})
+        finally:
+            self.in_flight -= 1
+
+        return web.json_response({'id': payload.get('id'), 'result': result, 'error': None})
+
+    def get_session_key(self, username, password):
+        if username != self.username or password != self.password:
+            return {'status': 'Invalid user name or password'}
+        session_key = uuid.uuid4().hex
+        self.session_keys.add(session_key)
+        return session_key
+
+    def export(self, store, surveyid, missing_message):
+        """
+        Encode an entry of the store like Lime Survey does: utf-8 with byte order mark, base64.
+        """
+        if str(surveyid) not in store:
+            return {'status': missing_message}
+        data = codecs.BOM_UTF8 + store[str(surveyid)].encode('utf-8')
+        return base64.b64encode(data).decode('ascii')
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Start serving. With port 0 a free port is picked.
+        :return str: base url to hand to the downloaders
+        """
+        app = web.Application()
+        app.router.add_post(ENDPOINT.format(''), self.handle)
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = 'http://{}:{}'.format(host, port)
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
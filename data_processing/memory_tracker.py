@@ -0,0 +1,218 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def get_rss():
+    """
+    Function to obtain the resident set size of the process
+    :return int: bytes, None if neither psutil nor /proc is available
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class MemoryTracker():
+    """
+    A class to record how much memory the stages of a pipeline run use. A stage is either a block in
+    track() or a method of Downloader, SurveyProcessor or Plotter that was given the tracker as memory_tracker.
+    For every stage it records the resident set size before and after and its peak during the stage, the peak of
+    the memory allocated by Python (tracemalloc) during the stage and optionally the lines that allocated the most.
+    The peak resident set size is sampled by a background thread while stages run, so a spike shorter than the
+    sample interval can be missed; it is never below the size before or after the stage.
+    Stages can be nested, e.g. process_user_input() inside a dataset property.
+    Tracking is opt-in because tracemalloc slows Python down noticeably.
+    """
+
+    def __init__(self, top_allocations=10, budgets=None, sample_interval=0.01):
+        """
+        Initialization
+        :param int top_allocations: Number of lines with the biggest allocations to record per stage,
+            0 to skip the (costly) snapshots
+        :param dict budgets: {stage: bytes} the traced peak that a stage may use, see check_budgets()
+        :param float sample_interval: Seconds between two samples of the resident set size
+        """
+        self.top_allocations = top_allocations
+        self.budgets = budgets or {}
+        self.sample_interval = sample_interval
+
+        self.records = []  # one dict per finished stage, in the order they finished
+        self.stack = []  # running stages
+        self.started_tracing = False
+        self.sampler = None  # thread that samples the resident set size while stages run
+        self.stop_sampling = threading.Event()
+
+    @contextmanager
+    def track(self, stage):
+        """
+        Context manager to record the memory of a stage
+        :param str stage: name of the stage, e.g. 'SurveyProcessor.process_user_input'
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+        # the peak of the running stage is kept before the counter is reset for the new one
+        if self.stack:
+            self.stack[-1]['traced_peak'] = max(self.stack[-1]['traced_peak'], tracemalloc.get_traced_memory()[1])
+
+        rss = get_rss()
+        entry = {
+            'stage': stage,
+            'depth': len(self.stack),
+            'rss_before': rss,
+            'rss_peak': rss,
+            'traced_before': tracemalloc.get_traced_memory()[0],
+            'traced_peak': 0,
+            'snapshot': tracemalloc.take_snapshot() if self.top_allocations else None,
+            'start': time.perf_counter(),
+        }
+        self.reset_peak()
+        self.stack.append(entry)
+        if self.sampler is None and rss is not None:
+            self.start_sampling()
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            self.finish(entry)
+
+    def start_sampling(self):
+        """
+        Helper to start the thread that raises the RSS peak of all running stages
+        """
+        def sample():
+            while not self.stop_sampling.wait(self.sample_interval):
+                rss = get_rss()
+                for entry in list(self.stack):
+                    entry['rss_peak'] = max(entry['rss_peak'], rss)
+
+        self.stop_sampling.clear()
+        self.sampler = threading.Thread(target=sample, daemon=True)
+        self.sampler.start()
+
+    def reset_peak(self):
+        """
+        Helper to start a new peak of the traced memory, on Python < 3.9 the peak covers all previous stages
+        """
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    def finish(self, entry):
+        """
+        Helper to turn a finished stage into a record
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, entry['traced_peak'])
+        rss = get_rss()
+
+        record = {
+            'stage': entry['stage'],
+            'depth': entry['depth'],
+            'seconds': time.perf_counter() - entry['start'],
+            'rss_before': entry['rss_before'],
+            'rss_after': rss,
+            'rss_peak': max(entry['rss_peak'], rss) if rss is not None else None,
+            'traced_diff': current - entry['traced_before'],
+            'traced_peak': peak - entry['traced_before'],
+            'top_allocations': [],
+        }
+        if entry['snapshot'] is not None:
+            record['top_allocations'] = self.compare_snapshots(entry['snapshot'], tracemalloc.take_snapshot())
+        self.records.append(record)
+
+        # the outer stage continues, its peak includes the one of this stage
+        if self.stack:
+            self.stack[-1]['traced_peak'] = max(self.stack[-1]['traced_peak'], peak)
+            self.reset_peak()
+        else:
+            if self.sampler is not None:
+                self.stop_sampling.set()
+                self.sampler.join()
+                self.sampler = None
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+    def compare_snapshots(self, before, after):
+        """
+        Helper to find the lines that allocated the most memory between two snapshots
+        :return list of dict: {file, line, size_diff, count_diff} for the top lines
+        """
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        statistics = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+
+        allocations = []
+        for statistic in statistics[:self.top_allocations]:
+            frame = statistic.traceback[0]
+            allocations.append({'file': frame.filename, 'line': frame.lineno,
+                                'size_diff': statistic.size_diff, 'count_diff': statistic.count_diff})
+        return allocations
+
+    def report(self):
+        """
+        Method to obtain the records of all stages as a table (without the top allocations)
+        :return DataFrame: one row per stage with the byte counts and the duration
+        """
+        columns = ['stage', 'depth', 'seconds', 'rss_before', 'rss_after', 'rss_peak', 'traced_diff', 'traced_peak']
+        return pd.DataFrame([{column: record[column] for column in columns} for record in self.records],
+                            columns=columns)
+
+    def to_json(self, path=None):
+        """
+        Method to write the full report (including the top allocations) as json, e.g. for a benchmark suite
+        :param str path: file to write to. If None, the json is only returned
+        :return str: the json
+        """
+        report = json.dumps({'stages': self.records, 'budgets': self.budgets}, indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(report)
+        return report
+
+    def check_budgets(self):
+        """
+        Method to check that no stage used more traced memory than its budget
+        :return: None, an Exception with the stages that were over budget is raised otherwise
+        """
+        exceeded = [(record['stage'], record['traced_peak'], self.budgets[record['stage']])
+                    for record in self.records
+                    if record['stage'] in self.budgets and record['traced_peak'] > self.budgets[record['stage']]]
+        if exceeded:
+            raise Exception('The memory budget was exceeded (stage, peak, budget).', exceeded)
+
+    def clear(self):
+        """
+        Method to forget all records
+        """
+        self.records = []
+
+
+def tracked(method):
+    """
+    Decorator for methods of classes with a memory_tracker attribute: if a tracker is set, the call is recorded
+    as the stage <class name>.<method name>, otherwise the method runs as is.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.memory_tracker is None:
+            return method(self, *args, **kwargs)
+        with self.memory_tracker.track(type(self).__name__ + '.' + method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -5,19 +5,73 @@ from limepy.wrangle import Survey
 from lxml.html import fromstring
 from lxml.html.clean import Cleaner
 
+from data_processing.memory_tracker import tracked
+from data_processing.response_parser import convert_string_columns
+from data_processing.sampling import sample_reservoir, sample_stratified, sample_uniform
+
+
+# the columns Lime Survey puts in front of every export that do not belong to a question
+METADATA_COLUMNS = ['submitdate', 'lastpage', 'startlanguage', 'seed', 'startdate', 'datestamp', 'id', 'refurl']
+
+# question types whose answers are answer codes that can be looked up in the answer mapping
+CHOICE_QUESTION_TYPES = ["List radio", "List dropdown", "List with comment", "Array", "Ranking",
+                         "Multiple choice", "Multiple choice with comments"]
+FREE_TEXT_QUESTION_TYPES = ["Long free text", "Short free text"]
+
+
+# one cleaner for all texts, building it costs more than cleaning most texts
+CLEANER = Cleaner(
+    comments=True,  # True = remove comments
+    meta=True,  # True = remove meta tags
+    scripts=True,  # True = remove script tags
+    embedded=True,  # True = remove embeded tags
+)
+
+# texts without any of these characters contain no markup, lxml would only normalize their whitespace
+NEEDS_CLEANING = re.compile(r'[<&\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufeff\ud800-\udfff]')
+
+
+def clean_text(text):
+    """
+    Function to remove all the javascript and formatting from text
+    :param str text: Text to be cleaned from formatting.
+    :return str result: Cleaned text.
+    """
+    if NEEDS_CLEANING.search(text):
+        clean_dom = CLEANER.clean_html(text)
+        cleaner_text = fromstring(clean_dom).text_content()
+    else:
+        # skip the parsing, but treat line breaks and leading whitespace like lxml does
+        cleaner_text = text.replace('\r\n', '\n').replace('\r', '\n').lstrip(' \t\n')
+
+    # now remove all the \x\n etc. from text
+    result = cleaner_text.replace('\n', ' ').replace('\xa0', ' ')
+    return result
+
 
 class SurveyProcessor(object):
     """
     A general class to process Lime Survey surveys and bring them into a nice format for analyses.
     """
 
-    def __init__(self, survey):
+    # extra columns of a concrete survey that are put in front of the question columns of the scheme:
+    # 'other' fields as (question code, field name) and metadata columns by name
+    other_columns = []
+    metadata_columns = []
+
+    memory_tracker = None
+
+    def __init__(self, survey, memory_tracker=None):
         """
         Initialization
         :param Survey survey: An object holding the survey to be processed.
+        :param MemoryTracker memory_tracker: If given, the memory used by the processing methods is recorded
         """
         self.survey = survey
+        self.memory_tracker = memory_tracker
         self.num_questions = self.survey.question_list.shape[0]
+        self.schema_df = None  # built by convert_questions_to_df()
+        self.question_overview_df = None  # built by create_question_overview_df()
 
     def filter_completed_questions(self, data_df, lastpage=-1):
         """
@@ -50,24 +104,29 @@ class SurveyProcessor(object):
         # use the boolean mask to filter the relevant rows in the dataframe
         return data_df[reaches_question]
 
+    def filter_responses(self, data_df, completed_only=True, at_least_answer=None):
+        """
+        Function to apply the participant filters of process_user_input()
+        :param DataFrame data_df: pandas DF that contains the survey response data
+        :param bool completed_only: If it is true, we only include users that have gone until the end
+        :param int at_least_answer: If completed_only is False, only users that answered at least until this question
+        :return DataFrame: the filtered data
+        """
+        if completed_only:  # filter out all non completed surveys
+            data_df = self.filter_completed_questions(data_df)
+
+        elif at_least_answer: # check that at_least_answer is set and not None
+            data_df = self.filter_by_last_page(data_df, lastpage=at_least_answer)
+
+        return data_df
+
     def clean_text(self, text):
         """
         Function to remove all the javascript and formatting from text
         :param str text: Text to be cleaned from formatting.
         :return str result: Cleaned text.
         """
-        cleaner = Cleaner(
-            comments=True,  # True = remove comments
-            meta=True,  # True = remove meta tags
-            scripts=True,  # True = remove script tags
-            embedded=True,  # True = remove embeded tags
-        )
-        clean_dom = cleaner.clean_html(text)
-        cleaner_text = fromstring(clean_dom).text_content()
-
-        # now remove all the \x\n etc. from text
-        result = cleaner_text.replace('\n', ' ').replace('\xa0', ' ')
-        return result
+        return clean_text(text)
 
     def make_answer_code_to_text_mapping(self, a_code=True):
         """
@@ -115,6 +174,7 @@ class SurveyProcessor(object):
             mapping[question['title']] = question_map
         return mapping
 
+    @tracked
     def make_answer_code_to_text_mapping_df(self, a_code=True):
         """
         Method to generate a mapping from answer codes to answer texts as a Dataframe
@@ -190,9 +250,12 @@ class SurveyProcessor(object):
     def create_question_overview_df(self):
         """
         Method to create a dataframe that holds a mapping from every question code to
-        the corresponding question text and type
+        the corresponding question text and type. It is built once per processor, every call returns a copy of it
+        that can be changed freely.
         :return DataFrame: Mapping
         """
+        if self.question_overview_df is not None:
+            return self.question_overview_df.copy()
 
         questions = self.survey.questions
 
@@ -252,7 +315,8 @@ class SurveyProcessor(object):
                                          index=all_answer_columns,
                                          columns=['Question', 'Question Type', 'Lime Index']).T
 
-        return survey_answers_df
+        self.question_overview_df = survey_answers_df
+        return survey_answers_df.copy()
 
     def convert_questions_to_df(self):
         """
@@ -263,19 +327,37 @@ class SurveyProcessor(object):
          and put into libraries like seaborn directly, answer code: like it falls out of the survey, and
          answer text, which is the according long text for the answer. This fastens the lookup for machine
          readable and generated results to the real world-answers.
+         The scheme is built once per processor, every call returns a copy of it, so subclasses can still insert
+         their own columns into the result.
          :return Dataframe: Empty dataframe that has a multi-index structure according to the survey
          """
+        if self.schema_df is None:
+            header = pd.MultiIndex.from_tuples(self.make_schema_columns(), names=['code', 'version'])
+            schema_df = pd.DataFrame(columns=header)
+
+            # the extra columns of the concrete survey used to be inserted one by one as empty float columns,
+            # they keep that dtype so the processed output stays the same
+            extra_columns = list(self.other_columns) + [(name, '') for name in self.metadata_columns]
+            if extra_columns:
+                schema_df = schema_df.astype({column: 'float64' for column in extra_columns})
+            self.schema_df = schema_df
+        return self.schema_df.copy()
+
+    def make_schema_columns(self):
+        """
+        Collects the (code, version) pairs of all columns of the scheme in one pass over the questions.
+        The extra columns of the concrete survey (see other_columns and metadata_columns) come first.
+        :return list of tuple: the columns of the scheme
+        """
 
         questions = self.survey.questions
 
-        # collect all dataframes; for every (sub)question a 2-index dataframe is created
-        # so that they can be merged at the end
-        frames = []
+        # the extra columns are declared by the concrete survey, metadata columns have no second level
+        columns = list(self.other_columns) + [(name, '') for name in self.metadata_columns]
 
         # iterate over all questions and treat them according to the question type
         for q in questions:
             question_code = questions[q]['title']
-            question_text = self.clean_text(questions[q]['question'])
             question_type = questions[q]['question_type']
 
             # if there is only one element to select (List radio or (List dropdown)
@@ -284,13 +366,7 @@ class SurveyProcessor(object):
             if question_type == "List radio" or question_type == "List dropdown":
 
                 second_level_index = ["a_code", "a_text", "a"]
-                header = pd.MultiIndex.from_product([[question_code],
-                                                     second_level_index], names=['code', 'version'])
-
-                df = pd.DataFrame(columns=header)
-
-                # append the new cdataframe
-                frames.append(df)
+                columns.extend((question_code, version) for version in second_level_index)
 
             # for Multiple choice questions append two columns per answer.
             # a machine readable one (0/1 for no or yes) and one with the text of this subquestion
@@ -298,36 +374,24 @@ class SurveyProcessor(object):
             # so we can extract it more easily during analyses
             elif question_type == "Multiple choice":
 
+                second_level_index = ["a_text", "a"]
+
                 # iterate over all subquestions (by the format of limepy, the subquestions section always has key '0')
                 for s in questions[q]['subquestions']['0']:
                     sub_question_code = (s['title'])
                     merged_code = question_code + "[" + sub_question_code + "]"
-
-                    second_level_index = ["a_text", "a"]
-                    header = pd.MultiIndex.from_product([[merged_code],
-                                                         second_level_index], names=['code', 'version'])
-                    df = pd.DataFrame(columns=header)
-
-                    # append the new cdataframe
-                    frames.append(df)
+                    columns.extend((merged_code, version) for version in second_level_index)
 
             # if there is only one element to select (List radio or (List dropdown) + a comment
             # create 4 columns: the 3 from list + an additional one for the comment
             elif question_type == "List with comment":
 
                 second_level_index = ["a_code", "a_text", "a", question_code + "[comment]"]
-                header = pd.MultiIndex.from_product([[question_code],
-                                                     second_level_index],
-                                                    names=['code', 'version'])
-
-                df = pd.DataFrame(columns=header)
-
-                # append the new cdataframe
-                frames.append(df)
+                columns.extend((question_code, version) for version in second_level_index)
 
             # for Multiple choice questions append three columns per answer.
             # like Multiple choice + comment field
-            elif questions[q]['question_type'] == "Multiple choice with comments":
+            elif question_type == "Multiple choice with comments":
 
                 # iterate over all subquestions (by the format of limepy, the subquestions section always has key '0')
                 for s in questions[q]['subquestions']['0']:
@@ -335,37 +399,26 @@ class SurveyProcessor(object):
                     merged_code = question_code + "[" + sub_question_code + "]"
 
                     second_level_index = ["a_text", "a", question_code + "[" + sub_question_code + "comment]"]
-                    header = pd.MultiIndex.from_product([[merged_code],
-                                                         second_level_index], names=['code', 'version'])
-                    df = pd.DataFrame(columns=header)
-
-                    # append the new cdataframe
-                    frames.append(df)
+                    columns.extend((merged_code, version) for version in second_level_index)
 
             # here we need 2 columns per possible answer (like multiple choice).
             # One that contains the text.
             # a second one that should be machine readable:
             # Results of the participants are entered with integers. 1 shows highest priority, n lowest,
             # 0 shows that it was not selected by the participant
-            elif questions[q]['question_type'] == "Ranking":
+            elif question_type == "Ranking":
+
+                second_level_index = ["a", "a_text"]
 
                 # iterate over all answers (by the format of limepy, the answers section always has key '0')
                 for a in questions[q]['answers']['0']:
                     answer_code = a['sortorder']
                     merged_code = question_code + "[" + answer_code + "]"
-
-                    second_level_index = ["a", "a_text"]
-                    header = pd.MultiIndex.from_product([[merged_code],
-                                                         second_level_index],
-                                                        names=['code', 'version'])
-                    df = pd.DataFrame(columns=header)
-
-                    # append the new cdataframe
-                    frames.append(df)
+                    columns.extend((merged_code, version) for version in second_level_index)
 
             # each question in the array is to be treated like a normal list radio question and should therefore
             # receive 3 columns
-            elif questions[q]['question_type'] == "Array":
+            elif question_type == "Array":
 
                 second_level_index = ["a_code", "a_text", "a"]
 
@@ -373,68 +426,149 @@ class SurveyProcessor(object):
                 for s in questions[q]['subquestions']['0']:
                     sub_question_code = (s['title'])  # subquestion code
                     merged_code = question_code + "[" + sub_question_code + "]"  # bring the codes together
+                    columns.extend((merged_code, version) for version in second_level_index)
 
-                    header = pd.MultiIndex.from_product([[merged_code],
-                                                         second_level_index], names=['code', 'version'])
-
-                    df = pd.DataFrame(columns=header)
+            # one column for the free text
+            elif question_type == "Long free text" or question_type == "Short free text":
 
-                    # append the new cdataframe
-                    frames.append(df)
+                columns.append((question_code, "a"))
 
-            # one column for the free text
-            elif questions[q]['question_type'] == "Long free text" or questions[q][
-                'question_type'] == "Short free text":
+            # Case for questions of which the type is not listed
+            else:
+                print("error, type not known ", question_type)
 
-                second_level_index = ["a"]
-                header = pd.MultiIndex.from_product([[question_code],
-                                                     second_level_index], names=['code', 'version'])
+        return columns
 
-                df = pd.DataFrame(columns=header)
+    @tracked
+    def validate_user_input(self, data_df=None):
+        """
+        Method to check the raw responses against the survey structure before any processing. All columns are
+        compared with the questions at once and the answer codes of every column are checked against the answer
+        possibilities of its question, so one run reports all problems.
+        :param DataFrame data_df: raw survey data, by default the data of the survey
+        :return DataFrame: One row per problem with the columns 'column', 'problem' and 'values'. Problems are
+            'unknown column': the column does not belong to any question (processing would fail)
+            'unknown empty column': like 'unknown column', but nobody answered it (processing still works)
+            'invalid answer code': the column holds codes that are no answer possibility, listed in 'values'
+                (processing would fail)
+            'missing column': a question of the survey has no column in the data (processing still works)
+        """
+        if data_df is None:
+            data_df = self.survey.dataframe
 
-                # append the new dataframe
-                frames.append(df)
+        question_types = self.create_question_overview_df().loc['Question Type']
+        mapping = self.make_answer_code_to_text_mapping()
 
-            # Case for questions of which the type is not listed
+        problems = []
+
+        # other and comment fields are taken as they come, like in process_user_input()
+        columns = set(data_df.columns)
+        known = set(question_types.index) | set(METADATA_COLUMNS)
+        known |= {c for c in columns if 'other' in c or 'comment' in c}
+        unknown = columns - known
+        for columnName in data_df.columns:
+            if columnName in unknown:
+                if data_df[columnName].notna().any():
+                    problems.append((columnName, 'unknown column', []))
+                else:
+                    problems.append((columnName, 'unknown empty column', []))
+
+        for columnName in question_types.index:
+            if columnName not in columns:
+                problems.append((columnName, 'missing column', []))
+
+        # the codes every question type accepts, see process_user_input()
+        for columnName in data_df.columns:
+            if columnName in unknown or columnName not in question_types.index:
+                continue
+            question_type = question_types[columnName]
+            outer_part = columnName[:columnName.find("[")] if '[' in columnName else columnName
+
+            if question_type == "List radio" or question_type == "List dropdown" or question_type == "List with comment":
+                allowed = list(mapping[outer_part]) + ['-oth-']
+            elif question_type == "Multiple choice" or question_type == "Multiple choice with comments":
+                allowed = ['Y']
+            elif question_type == "Ranking" or question_type == "Array":
+                allowed = list(mapping[outer_part])
             else:
-                print("error, type not known ", questions[q]['question_type'])
+                continue
 
-        # create an empty dataframe from all the individual ones
-        result = pd.concat(frames)
-        return result
+            values = data_df[columnName]
+            invalid = values[values.notna() & ~values.isin(allowed)]
+            if len(invalid) > 0:
+                problems.append((columnName, 'invalid answer code', sorted(str(v) for v in pd.unique(invalid))))
+
+        return pd.DataFrame(problems, columns=['column', 'problem', 'values'])
+
+    def check_user_input(self, data_df):
+        """
+        Method to stop before processing if validate_user_input() finds anything that would make processing fail
+        :param DataFrame data_df: raw survey data
+        """
+        report = self.validate_user_input(data_df)
+        errors = report[~report['problem'].isin(['missing column', 'unknown empty column'])]
+        if len(errors) > 0:
+            raise Exception('The responses do not fit the survey structure.', errors)
 
-    def process_user_input(self, completed_only=True, at_least_answer=None, fill_na=True):
+    def get_text_columns(self, user_output):
+        """
+        Method to find the columns of the processed data that hold texts: the answer texts ('a_text'),
+        the answers of free text questions and the comment and other fields
+        :param DataFrame user_output: processed data as it falls out of process_user_input()
+        :return list: the (code, version) columns
+        """
+        question_types = self.create_question_overview_df().loc['Question Type']
+
+        columns = []
+        for code, version in user_output.columns:
+            if version == 'a_text' or '[' in version:
+                columns.append((code, version))
+            elif version == 'a' and question_types.get(code) in FREE_TEXT_QUESTION_TYPES:
+                columns.append((code, version))
+        return columns
+
+    @tracked
+    def process_user_input(self, completed_only=True, at_least_answer=None, fill_na=True, validate=True,
+                           data_df=None, string_storage=None):
         """
             Take a survey and transform the responses to the pandas dataframe
             :param bool completed_only: If it is true, we only include users that have gone until the end
             :param int at_least_answer: If an int is specified, all participants that have answered to at least this
             question (but maybe not until the end) are included. To specify it, completed_only must be False
             :param bool fill_na: If it is true, we fill the NaN values in the dataframe with 0
+            :param bool validate: If it is true, the responses are checked with validate_user_input() first and
+            all problems are reported at once
+            :param DataFrame data_df: raw responses to process instead of the ones of the survey (e.g. a sample)
+            :param str string_storage: 'pyarrow' to keep the text columns (see get_text_columns()) as Arrow-backed
+            strings, which take less memory. None keeps Python objects.
            :return DataFrame: A filled version of the dataframe with the scheme specified in survey_df
         """
 
         # extract participant data and question data from survey object
         survey_df = self.convert_questions_to_df() # Create the scheme for the table in form of an empty DataFrame
-        data_df = self.survey.dataframe
+        if data_df is None:
+            data_df = self.survey.dataframe
 
         # make a copy to not harm the original object
         survey_df_copy = survey_df.copy()
 
-        if completed_only:  # filter out all non completed surveys
-            data_df = self.filter_completed_questions(data_df)
-
-        elif at_least_answer: # check that at_least_answer is set and not None
-            data_df = self.filter_by_last_page(data_df, lastpage=at_least_answer)
+        data_df = self.filter_responses(data_df, completed_only, at_least_answer)
+        if validate:
+            self.check_user_input(data_df)
 
         # create the dictionary for mapping
         mapping = self.make_answer_code_to_text_mapping()
+        my_question_overview_df = self.create_question_overview_df()
+
+        # the rows of all participants are collected and put into the scheme at once in the end,
+        # growing the frame participant by participant would copy it every time
+        participant_dicts = []
 
         # now iterate over all participants
         for index, row in data_df.iterrows():
 
             # for each participant, we hold an empty dict to be filled with values
             participant_dict = {}
-            my_question_overview_df = self.create_question_overview_df()
 
             # and over every value that belongs to them
             for columnName, columnData in row.iteritems():
@@ -464,8 +598,7 @@ class SurveyProcessor(object):
                 else:
 
                     # if we have the metadata columns just fill them as they come
-                    if columnName in ['submitdate', 'lastpage', 'startlanguage', 'seed', 'startdate', 'datestamp',
-                                      'id', 'refurl']:
+                    if columnName in METADATA_COLUMNS:
                         participant_dict[(columnName, '')] = columnData
 
                     # if we still encounter a question type that we have not foreseen
@@ -529,12 +662,237 @@ class SurveyProcessor(object):
                             # print(question_type, columnName)
 
 
-            survey_df_copy = pd.concat([survey_df_copy, pd.DataFrame.from_records([participant_dict])])
+            participant_dicts.append(participant_dict)
+
+        # the values are kept as Python objects (e.g. answers as int, not float because of missing ones),
+        # which is what the object columns of the scheme hold. The other columns get the dtype that adding the
+        # participants one by one gave them: dates are datetime and numbers float (e.g. id, seed, lastpage)
+        participants_df = pd.DataFrame(participant_dicts, dtype=object)
+        inferred_df = participants_df.infer_objects()
+        for column in participants_df.columns:
+            inferred_dtype = inferred_df[column].dtype
+            if pd.api.types.is_datetime64_any_dtype(inferred_dtype):
+                participants_df[column] = inferred_df[column]
+            elif inferred_dtype.kind in 'iuf' and (column not in survey_df_copy.columns
+                                                  or survey_df_copy[column].dtype != object):
+                participants_df[column] = inferred_df[column].astype('float64')
+
+        survey_df_copy = pd.concat([survey_df_copy, participants_df])
 
         # set the index to the participant ID in Lime Survey for better comparability
         survey_df_copy = survey_df_copy.set_index('id')
+
+        if string_storage is not None:
+            survey_df_copy = convert_string_columns(survey_df_copy, string_storage,
+                                                    self.get_text_columns(survey_df_copy))
         return survey_df_copy
 
+    @tracked
+    def process_user_input_preview(self, n=None, frac=None, method='uniform', stratify_by=None, chunks=None,
+                                   random_state=0, completed_only=True, at_least_answer=None, fill_na=True,
+                                   validate=True, string_storage=None):
+        """
+        Preview mode of process_user_input(): only a reproducible random sample of the participants is processed,
+        which is much faster while the analysis is still being written. The result has an extra column
+        ('weight', '') with the number of participants every row stands for, so summing the weights (instead of
+        counting rows) estimates the counts of the full data.
+        :param int n: number of participants to process
+        :param float frac: share of the participants to process (instead of n, not for 'reservoir')
+        :param string method: 'uniform' (simple random sample), 'stratified' (every answer of stratify_by in
+            proportion, e.g. per startlanguage) or 'reservoir' (sample from a stream of responses)
+        :param string stratify_by: raw column to stratify by, only for 'stratified'
+        :param iterable chunks: DataFrames with raw responses for 'reservoir', e.g. pd.read_csv(..., chunksize=1000).
+            If None, the responses of the survey are streamed
+        :param int random_state: seed, the same seed gives the same sample
+        :param bool completed_only: see process_user_input(), applied before sampling
+        :param int at_least_answer: see process_user_input(), applied before sampling
+        :param bool fill_na: see process_user_input()
+        :param bool validate: see process_user_input()
+        :param str string_storage: see process_user_input()
+        :return DataFrame: the processed sample
+        """
+        if method == 'reservoir':
+            if n is None:
+                raise Exception('Reservoir sampling needs the number of participants n.')
+            if chunks is None:
+                data_df = self.survey.dataframe
+                chunks = (data_df.iloc[start:start + 1000] for start in range(0, len(data_df), 1000))
+            sample_df, weights = sample_reservoir(chunks, n, random_state,
+                                                  lambda chunk: self.filter_responses(chunk, completed_only,
+                                                                                      at_least_answer))
+        else:
+            data_df = self.filter_responses(self.survey.dataframe, completed_only, at_least_answer)
+            if method == 'uniform':
+                sample_df, weights = sample_uniform(data_df, n, frac, random_state)
+            elif method == 'stratified':
+                if stratify_by is None:
+                    raise Exception('Stratified sampling needs a column in stratify_by.')
+                sample_df, weights = sample_stratified(data_df, stratify_by, n, frac, random_state)
+            else:
+                raise Exception('Unknown sampling method.', method)
+
+        # the sample is already filtered
+        user_output = self.process_user_input(completed_only=False, fill_na=fill_na, validate=validate,
+                                              data_df=sample_df, string_storage=string_storage)
+
+        # the weights are matched over the participant ID
+        weights = pd.Series(weights.to_numpy(), index=sample_df['id'].to_numpy())
+        user_output[('weight', '')] = weights.reindex(user_output.index).to_numpy()
+        return user_output
+
+    @tracked
+    def process_user_input_long(self, completed_only=True, at_least_answer=None, validate=True):
+        """
+        Alternative to process_user_input() with a long (tidy) layout: one row per answered cell instead of one
+        row per participant. Nothing is stored for skipped questions, which makes the result small for sparse
+        surveys and easy to group by question.
+        The columns are:
+            id: participant ID in Lime Survey
+            q_code: question code, e.g. AWA2 for AWA2[SQ001]
+            sub: subquestion code (Multiple choice, Array), rank (Ranking), other/comment field or '' if none
+            a_code: the answer code as it falls out of the survey (e.g. A1, Y)
+            a: machine readable answer, see convert_answer_code_to_int()
+            a_text: the answer text, for free text, comments and other fields the text that was entered
+        :param bool completed_only: If it is true, we only include users that have gone until the end
+        :param int at_least_answer: If an int is specified, all participants that have answered to at least this
+            question (but maybe not until the end) are included. To specify it, completed_only must be False
+        :param bool validate: If it is true, the responses are checked with validate_user_input() first
+        :return DataFrame: The answers in long format
+        """
+        data_df = self.filter_responses(self.survey.dataframe, completed_only, at_least_answer)
+        if validate:
+            self.check_user_input(data_df)
+        mapping = self.make_answer_code_to_text_mapping()
+        my_question_overview_df = self.create_question_overview_df()
+
+        # columns nobody answered have no cells in the result, so they need no type either
+        # (like in process_user_input(), an unknown column only fails if it holds an answer)
+        answer_columns = [c for c in data_df.columns if c not in METADATA_COLUMNS and data_df[c].notna().any()]
+
+        # look up everything that depends on the column only once per column instead of once per cell
+        column_info = {}
+        for columnName in answer_columns:
+            if '[' in columnName:
+                q_code = columnName[:columnName.find("[")]  # what is before []
+                sub = columnName[columnName.find("[") + 1:columnName.find("]")]  # what is inside []
+            else:
+                q_code, sub = columnName, ''
+
+            # other and comment fields hold entered text, like free text questions
+            if 'other' in columnName or 'comment' in columnName:
+                question_type = 'Text'
+            elif columnName not in my_question_overview_df.keys():
+                raise Exception('The column you are trying to enter seems not to fit.', columnName)
+            else:
+                question_type = my_question_overview_df[columnName]['Question Type']
+            column_info[columnName] = (q_code, sub, question_type)
+        column_info = pd.DataFrame.from_dict(column_info, orient='index', columns=['q_code', 'sub', 'type'])
+
+        # one row per cell, keep only the answered ones
+        long_df = data_df.melt(id_vars=['id'], value_vars=answer_columns, var_name='column', value_name='value')
+        long_df = long_df[long_df['value'].notna()]
+        long_df = long_df.join(column_info, on='column')
+
+        is_choice = long_df['type'].isin(CHOICE_QUESTION_TYPES)
+        is_multiple_choice = long_df['type'].isin(["Multiple choice", "Multiple choice with comments"])
+        is_text = long_df['type'].isin(FREE_TEXT_QUESTION_TYPES + ['Text'])
+
+        a_code = long_df['value'].astype(str).where(is_choice)
+        unique_codes = a_code.dropna().unique()
+        code_to_int = {code: self.convert_answer_code_to_int(code) for code in unique_codes}
+
+        # multiple choice texts belong to the subquestion, all others to the answer code
+        text_key = long_df['sub'].where(is_multiple_choice, a_code)
+        texts = {(q_code, code): text for q_code, question_map in mapping.items()
+                 for code, text in question_map.items()}
+        texts.update({(q_code, '-oth-'): 'other' for q_code in mapping})
+        lookup = pd.Series(list(texts.values()), index=pd.MultiIndex.from_tuples(list(texts.keys())), dtype=object)
+        a_text = lookup.reindex(pd.MultiIndex.from_arrays([long_df['q_code'], text_key])).values
+
+        result = pd.DataFrame({
+            'id': long_df['id'].values,
+            'q_code': pd.Categorical(long_df['q_code'].values),
+            'sub': pd.Categorical(long_df['sub'].values),
+            'a_code': pd.Categorical(a_code.values),
+            'a': pd.array(a_code.map(code_to_int).values, dtype='Int16'),
+            'a_text': long_df['value'].where(is_text, pd.Series(a_text, index=long_df.index)).values,
+        })
+        return result
+
+    @tracked
+    def convert_long_to_wide(self, long_df):
+        """
+        Method to bring the long layout of process_user_input_long() back into the wide layout of
+        process_user_input(), with the same columns, column order and index. The metadata columns are taken from
+        the survey data. Participants without any answer do not appear in the long layout and therefore neither
+        in the result.
+        :param DataFrame long_df: answers in long format
+        :return DataFrame: the answers with the scheme specified in convert_questions_to_df()
+        """
+        my_question_overview_df = self.create_question_overview_df()
+        question_types = my_question_overview_df.loc['Question Type']
+
+        q_code = long_df['q_code'].astype(str)
+        sub = long_df['sub'].astype(str)
+        columnName = q_code.where(sub == '', q_code + '[' + sub + ']')
+        question_type = columnName.map(question_types)
+
+        # other and comment fields are stored under the question with the full column name as second level
+        is_other = columnName.str.contains('other', regex=False)
+        is_extra = is_other | columnName.str.contains('comment', regex=False)
+        extra_code = q_code.where(is_other, columnName.str.replace('comment', '', regex=False)
+                                  .str.replace('[]', '', regex=False))
+
+        is_list = ~is_extra & question_type.isin(["List radio", "List dropdown", "List with comment", "Array"])
+        is_choice = ~is_extra & question_type.isin(CHOICE_QUESTION_TYPES)
+        is_text = ~is_extra & question_type.isin(FREE_TEXT_QUESTION_TYPES)
+
+        parts = []
+        for mask, code, version, values in [(is_list, columnName, 'a_code', long_df['a_code']),
+                                            (is_choice, columnName, 'a_text', long_df['a_text']),
+                                            (is_choice, columnName, 'a', long_df['a']),
+                                            (is_text, columnName, 'a', long_df['a_text']),
+                                            (is_extra, extra_code, columnName, long_df['a_text'])]:
+            mask = mask.values
+            parts.append(pd.DataFrame({'id': long_df['id'].values[mask],
+                                       'code': code.values[mask],
+                                       'version': version.values[mask] if isinstance(version, pd.Series) else version,
+                                       'value': values.astype(object).values[mask]}))
+        stacked = pd.concat(parts, ignore_index=True)
+        wide = stacked.set_index(['id', 'code', 'version'])['value'].unstack(['code', 'version'])
+
+        # the participants in the order of the survey data, the metadata is not part of the long layout
+        data_df = self.survey.dataframe
+        data_df = data_df[data_df['id'].isin(wide.index)]
+        wide = wide.reindex(data_df['id'].values)
+        metadata = {(columnName, ''): data_df[columnName].values for columnName in METADATA_COLUMNS
+                    if columnName != 'id' and columnName in data_df.columns}
+
+        # like in process_user_input(), the columns of the scheme come first and the others (other and comment
+        # fields the scheme does not know, metadata) only if someone has a value in them. These are ordered
+        # by the first participant with a value, then by their position in the survey data
+        schema_columns = list(self.convert_questions_to_df().columns)
+        known = set(schema_columns)
+        extra_columns = [c for c in wide.columns if c not in known]
+        extra_columns += [c for c, values in metadata.items() if c not in known and pd.notna(values).any()]
+        positions = {columnName: position for position, columnName in enumerate(data_df.columns)}
+
+        def first_value(column):
+            source = column[0] if column[1] == '' else column[1]
+            values = metadata[column] if column in metadata else wide[column].values
+            return pd.notna(values).argmax(), positions.get(source, len(positions))
+
+        columns = schema_columns + sorted(extra_columns, key=first_value)
+        wide = wide.reindex(columns=pd.MultiIndex.from_tuples(columns))
+        for column, values in metadata.items():
+            if column in wide.columns:
+                wide[column] = values
+        wide = wide.drop(columns=[('id', '')], errors='ignore')
+
+        # the ids are numbers and come out of process_user_input() as float
+        wide.index = pd.Index(wide.index, dtype='float64', name='id')
+        return wide
+
 
 class MLSurveyProcessor(SurveyProcessor):
     """
@@ -543,30 +901,17 @@ class MLSurveyProcessor(SurveyProcessor):
     Therefore, it uses the general structure + extra fields
     """
 
-    def convert_questions_to_df(self):
-        # get the general structure from the parent class
-        result = super().convert_questions_to_df()
-
-        # and add the concrete fields we need
-        # the metadata columns (from the front)
-        result.insert(0, "submitdate", [])
-        result.insert(0, "lastpage", [])
-        result.insert(0, "startlanguage", [])
-        result.insert(0, "seed", [])
-        result.insert(0, "startdate", [])
-        result.insert(0, "datestamp", [])
-        result.insert(0, "id", [])
-        result.insert(0, "refurl", [])
-
-        # now add the 'other' fields to
-        # result.insert(0, ('AWA2', 'AWA2[other]'), [])
-        # result.insert(0, ('DEM3', 'DEM3[other]'), [])
-        # result.insert(0, ('IMP3', 'IMP3[other]'), [])
-        # result.insert(0, ('IMP3', 'IMP3[othercomment]'), [])
-        result.insert(0, ('DEM3', 'DEM3[other]'), [])
-        result.insert(0, ('DEM8', 'DEM8[other]'), [])
-        result.insert(0, ('DEM11', 'DEM11[other]'), [])
-        result.insert(0, ('IMP3', 'IMP3[other]'), [])
-        result.insert(0, ('IMP6', 'IMP6[other]'), [])
-        result.insert(0, ('AWA2', 'AWA2[other]'), [])
-        return result
+    # the 'other' fields of the questions that allow them
+    # earlier version of the survey: ('AWA2', 'AWA2[other]'), ('DEM3', 'DEM3[other]'), ('IMP3', 'IMP3[other]'),
+    # ('IMP3', 'IMP3[othercomment]')
+    other_columns = [
+        ('AWA2', 'AWA2[other]'),
+        ('IMP6', 'IMP6[other]'),
+        ('IMP3', 'IMP3[other]'),
+        ('DEM11', 'DEM11[other]'),
+        ('DEM8', 'DEM8[other]'),
+        ('DEM3', 'DEM3[other]'),
+    ]
+
+    # the metadata columns (from the front)
+    metadata_columns = ["refurl", "id", "datestamp", "startdate", "seed", "startlanguage", "lastpage", "submitdate"]
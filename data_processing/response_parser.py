@@ -0,0 +1,218 @@
+import csv
+from io import BytesIO, StringIO
+
+import pandas as pd
+from lxml import etree
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Lime Survey question type codes whose answer columns only hold answer codes (A1, SQ001, Y, ...)
+SINGLE_COLUMN_TYPES = ['L', '!', 'O']  # List radio, List dropdown, List with comment
+SUBQUESTION_COLUMN_TYPES = ['M', 'P', 'F']  # Multiple choice (with comments), Array
+RANKING_TYPES = ['R']
+MULTIPLE_CHOICE_TYPES = ['M', 'P']
+
+# the metadata columns Lime Survey puts in front of every export
+METADATA_DTYPES = {
+    'id': 'Int32',
+    'lastpage': 'Int16',
+    'seed': 'Int32',
+    'startlanguage': 'category',
+}
+DATE_COLUMNS = ['submitdate', 'startdate', 'datestamp']
+
+
+def read_rows(document, section):
+    """
+    Helper to read all rows of a section of the .lss file as dicts
+    :param Element document: root of the parsed .lss file
+    :param str section: name of the section, e.g. 'questions'
+    :return list of dict: one dict {field: text} per row
+    """
+    return [{field.tag: field.text for field in row} for row in document.iterfind(section + '/rows/row')]
+
+
+def make_response_dtypes(structure):
+    """
+    Function to derive the column dtypes of a response export from the survey structure.
+    All columns that hold answer codes become categorical with the codes of the structure as categories (in the
+    order of the structure, also the codes nobody chose), so every download of the survey gets the same categories.
+    The metadata columns become small (nullable) integers. Free text, 'other' and 'comment' columns are left to be
+    inferred.
+    :param str structure: Survey Structure as read from the .lss file
+    :return dict: {column name: dtype}
+    """
+    if isinstance(structure, str):
+        structure = structure.encode('utf-8')
+    document = etree.fromstring(structure)
+
+    questions = {}
+    for question in read_rows(document, 'questions'):
+        questions[question['qid']] = question
+
+    subquestions = {}
+    for subquestion in read_rows(document, 'subquestions'):
+        titles = subquestions.setdefault(subquestion['parent_qid'], [])
+        if subquestion['title'] not in titles:
+            titles.append(subquestion['title'])
+
+    answers = {}
+    for answer in read_rows(document, 'answers'):
+        codes = answers.setdefault(answer['qid'], [])
+        if answer['code'] not in codes:
+            codes.append(answer['code'])
+
+    dtypes = dict(METADATA_DTYPES)
+    languages = [language.text for language in document.iterfind('languages/language')]
+    if languages:
+        dtypes['startlanguage'] = pd.CategoricalDtype(languages)
+
+    for qid, question in questions.items():
+        question_type = question['type']
+        question_code = question['title']
+        codes = answers.get(qid, [])
+
+        if question_type in SINGLE_COLUMN_TYPES:
+            # the 'other' option is stored with its own code
+            if question.get('other') == 'Y':
+                codes = codes + ['-oth-']
+            dtypes[question_code] = pd.CategoricalDtype(codes)
+
+        elif question_type in SUBQUESTION_COLUMN_TYPES:
+            # multiple choice columns only hold 'Y' for ticked options
+            if question_type in MULTIPLE_CHOICE_TYPES:
+                codes = ['Y']
+            for title in subquestions.get(qid, []):
+                dtypes[question_code + '[' + title + ']'] = pd.CategoricalDtype(codes)
+
+        # ranking columns are numbered by rank: IMP5[1], IMP5[2], ...
+        elif question_type in RANKING_TYPES:
+            for rank in range(1, len(codes) + 1):
+                dtypes[question_code + '[' + str(rank) + ']'] = pd.CategoricalDtype(codes)
+
+    return dtypes
+
+
+def set_categories(values, dtype):
+    """
+    Helper to give a categorical column the categories of the survey structure. Codes the structure does not know
+    are kept as additional categories at the end instead of being turned into missing values.
+    :param Series values: the column as it was read
+    :param CategoricalDtype dtype: as it falls out of make_response_dtypes()
+    :return Series: the column with the categories of dtype
+    """
+    unknown = [code for code in values.cat.categories if code not in set(dtype.categories)]
+    # astype() would keep the order of the categories as read, it sees unordered categoricals with the same
+    # categories as the same dtype
+    return values.cat.set_categories(list(dtype.categories) + unknown)
+
+
+def read_with_arrow(data, dtypes, string_storage=None):
+    """
+    Helper to parse the export with the pyarrow csv reader. Answer code columns are dictionary encoded
+    while reading, so the strings are never materialized per cell.
+    :param bytes data: The export
+    :param dict dtypes: {column name: dtype} or None
+    :param str string_storage: storage of the pandas string dtype for the text columns, None for object
+    :return DataFrame: the raw data
+    """
+    arrow_types = {'category': pa.dictionary(pa.int32(), pa.string()), 'Int16': pa.int16(), 'Int32': pa.int32()}
+    pandas_types = {pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype()}
+    if string_storage is not None:
+        # with 'pyarrow' the text columns keep the buffers of the reader
+        pandas_types[pa.string()] = pd.StringDtype(string_storage)
+
+    column_types = {}
+    if dtypes is not None:
+        column_types = {column: arrow_types['category' if isinstance(dtype, pd.CategoricalDtype) else dtype]
+                        for column, dtype in dtypes.items()}
+
+    # Long free texts can contain line breaks inside quotes, without newlines_in_values the reader splits
+    # the export into blocks (1 MB) at such a line break and fails
+    table = pa_csv.read_csv(pa.BufferReader(pa.py_buffer(data)),
+                            parse_options=pa_csv.ParseOptions(delimiter=';', newlines_in_values=True),
+                            convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                                  strings_can_be_null=True))
+    return table.to_pandas(types_mapper=pandas_types.get)
+
+
+def convert_string_columns(data_df, string_storage='pyarrow', columns=None):
+    """
+    Function to store the text columns of a DataFrame in the pandas string dtype.
+    With 'pyarrow', the texts are kept in Arrow buffers instead of one Python object per cell, which takes less
+    memory.
+    :param DataFrame data_df: raw or processed data
+    :param str string_storage: 'pyarrow' or 'python'
+    :param list columns: the columns to convert, None for all object columns
+    :return DataFrame: the data with converted text columns
+    """
+    dtype = pd.StringDtype(string_storage)
+    if columns is None:
+        columns = [column for column, column_dtype in data_df.dtypes.items() if column_dtype == object]
+    if columns:
+        data_df = data_df.astype({column: dtype for column in columns})
+    return data_df
+
+
+def parse_responses(data, dtypes=None, engine=None, string_storage=None):
+    """
+    Function to parse a response export (csv with ';' as separator) into a DataFrame.
+    Bytes are read directly without decoding them into one big Python string first.
+    :param bytes or str data: The export as it comes from the RemoteControl API
+    :param dict dtypes: {column name: dtype} e.g. from make_response_dtypes(). If None, the types are inferred.
+    :param str engine: 'pyarrow' for the pyarrow csv reader or a pandas csv engine like 'c'.
+        None uses pyarrow if it is installed.
+    :param str string_storage: 'pyarrow' to keep the text columns (free text, other, comment, ...) as Arrow-backed
+        strings, 'python' for pandas' string dtype, None for Python objects
+    :return DataFrame: the raw data
+    """
+    if engine is None:
+        engine = 'pyarrow' if pa is not None else 'c'
+
+    if engine == 'pyarrow':
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        data_df = read_with_arrow(data, dtypes, string_storage)
+
+    else:
+        if isinstance(data, bytes):
+            buffer = BytesIO(data)
+            newline = b'\n'
+        else:
+            buffer = StringIO(data)
+            newline = '\n'
+
+        # the first line holds the column names
+        end = data.find(newline)
+        header = data[:end if end != -1 else len(data)]
+        if isinstance(header, bytes):
+            header = header.decode('utf-8')
+
+        # only hand pandas the dtypes of columns that are really there
+        columns = next(csv.reader([header.rstrip('\r')], delimiter=';'))
+        kwargs = {}
+        if dtypes is not None:
+            # the categories are set afterwards, read_csv would turn unknown codes into missing values
+            kwargs['dtype'] = {c: 'category' if isinstance(dtypes[c], pd.CategoricalDtype) else dtypes[c]
+                               for c in columns if c in dtypes}
+
+        data_df = pd.read_csv(buffer, sep=';', engine=engine, **kwargs)
+
+    if dtypes is not None:
+        for column, dtype in dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and column in data_df.columns:
+                data_df[column] = set_categories(data_df[column], dtype)
+
+    # pyarrow already detects most timestamps itself, so the dates are only converted where needed
+    if dtypes is not None:
+        for column in DATE_COLUMNS:
+            if column in data_df.columns and not pd.api.types.is_datetime64_any_dtype(data_df[column]):
+                data_df[column] = pd.to_datetime(data_df[column])
+
+    if string_storage is not None:
+        data_df = convert_string_columns(data_df, string_storage)
+    return data_df
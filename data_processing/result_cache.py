@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Python types of the cells in object columns with the dtype they are stored in
+CELL_TYPES = {'str': 'string', 'int': 'Int64', 'float': 'float64', 'bool': 'boolean'}
+MISSING_VALUES = {'nan': np.nan, 'None': None}
+
+
+def dtype_name(dtype):
+    """
+    Helper to name a dtype so that astype() gives it back, str() does not tell the storage of the string dtype
+    """
+    if isinstance(dtype, pd.StringDtype):
+        return 'string[' + dtype.storage + ']'
+    return str(dtype)
+
+
+def describe_objects(values):
+    """
+    Helper to find the Python type of the cells of an object column and the value that marks missing cells
+    :param ndarray values: the cells
+    :return tuple: (cell type, missing value) as keys of CELL_TYPES and MISSING_VALUES,
+        None if the column holds several types or types that cannot be stored
+    """
+    missing = pd.isna(values)
+    cell_types = {type(value).__name__ for value in values[~missing]}
+    missing_values = {'None' if value is None else 'nan' if isinstance(value, float) else type(value).__name__
+                      for value in values[missing]}
+    if len(cell_types) > 1 or len(missing_values) > 1:
+        return None
+    cell_type = cell_types.pop() if cell_types else 'str'
+    missing_value = missing_values.pop() if missing_values else 'nan'
+    if cell_type not in CELL_TYPES or missing_value not in MISSING_VALUES:
+        return None
+    return cell_type, missing_value
+
+
+def encode_values(values):
+    """
+    Helper to bring a column (or the index) into a form parquet can hold
+    :param Series values: the column
+    :return tuple: (the values to store, the description needed to restore them),
+        (None, None) if the column cannot be stored
+    """
+    description = {'dtype': dtype_name(values.dtype)}
+    if values.dtype == object:
+        cells = describe_objects(values.to_numpy())
+        if cells is None:
+            return None, None
+        description['cells'] = cells
+        try:
+            values = values.astype(CELL_TYPES[cells[0]])
+        except (OverflowError, TypeError, ValueError):
+            return None, None
+    return values.array, description
+
+
+def decode_values(values, description):
+    """
+    Helper to restore a column (or the index) as it was before encode_values()
+    :param Series values: the column as it was read from parquet
+    :param dict description: as it falls out of encode_values()
+    :return: array with the original dtype and cells
+    """
+    if 'cells' in description:
+        cells = values.astype(object).to_numpy()
+        cells[values.isna().to_numpy()] = MISSING_VALUES[description['cells'][1]]
+        return cells
+    if dtype_name(values.dtype) != description['dtype']:
+        values = values.astype(description['dtype'])
+    return values.array
+
+
+class ResultCache():
+    """
+    A cache for the outputs of a survey processor on disk. An entry is found by a hash of everything the output
+    depends on: the raw responses, the survey structure, the processor class and the options of the call. So a
+    result is reused as long as none of these changed, and a new download or a new .lss never hits an old entry.
+    The outputs are stored as parquet. A json file next to it keeps what parquet cannot: the column labels, the
+    dtypes and, for object columns, the Python type of the cells (e.g. int answers next to NaN), so a cached output
+    is the same as the one of the direct call: same values, same types in object columns and same dtypes and index.
+    Outputs with object columns that mix several types (e.g. str and int) are not cached and computed every time.
+    When the cache grows over max_bytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 ** 3):
+        """
+        Initialization
+        :param str cache_dir: Directory that holds the cached outputs, it is created if necessary
+        :param int max_bytes: Maximum size of all cached files together
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def make_key(self, processor, method, structure=None, **options):
+        """
+        Method to compute the key of an output
+        :param SurveyProcessor processor: The processor that computes the output
+        :param str method: Name of the processor method
+        :param str structure: Survey Structure (content of the .lss file). If None, the parsed questions of the
+            survey are used instead.
+        :param options: The arguments of the call
+        :return str: hex digest
+        """
+        data_df = processor.survey.dataframe
+        digest = hashlib.sha256()
+
+        # the raw responses
+        digest.update(pd.util.hash_pandas_object(data_df, index=True).values.tobytes())
+        digest.update(json.dumps([str(c) for c in data_df.columns] + [str(t) for t in data_df.dtypes]).encode())
+
+        # the survey structure
+        if structure is None:
+            structure = json.dumps(processor.survey.questions, sort_keys=True, default=str)
+        digest.update(structure.encode())
+
+        # the processor with its extra columns and the call
+        cls = type(processor)
+        digest.update(json.dumps([cls.__module__, cls.__qualname__, processor.other_columns,
+                                  processor.metadata_columns, method, options], sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return self.cache_dir / (key + '.parquet')
+
+    def description_path(self, key):
+        return self.cache_dir / (key + '.json')
+
+    def load(self, key):
+        """
+        Method to read an entry
+        :param str key: as it falls out of make_key()
+        :return DataFrame: the cached output or None if there is none
+        """
+        path = self.path(key)
+        if not path.exists() or not self.description_path(key).exists():
+            return None
+        os.utime(path)  # mark as recently used
+        with open(self.description_path(key)) as f:
+            description = json.load(f)
+        stored_df = pd.read_parquet(path)
+
+        data = {}
+        for position, column_description in enumerate(description['columns']):
+            data[position] = decode_values(stored_df[str(position)], column_description)
+
+        index_description = description['index']
+        if 'range' in index_description:
+            index = pd.RangeIndex(*index_description['range'], name=index_description['name'])
+        else:
+            values = decode_values(stored_df['index'], index_description)
+            index = pd.Index(values, dtype=index_description['dtype'], name=index_description['name'])
+
+        labels = description['labels']
+        if description['multi_index']:
+            names = description['label_names']
+            if labels:
+                columns = pd.MultiIndex.from_tuples([tuple(label) for label in labels], names=names)
+            else:
+                columns = pd.MultiIndex.from_arrays([[] for _ in names], names=names)
+        else:
+            columns = pd.Index(labels, name=description['label_names'][0])
+
+        result = pd.DataFrame(data, index=index)
+        result.columns = columns
+        return result
+
+    def store(self, key, df):
+        """
+        Method to write an entry
+        :param str key: as it falls out of make_key()
+        :param DataFrame df: the output
+        :return bool: False if the output cannot be stored, see the class description
+        """
+        data = {}
+        columns = []
+        for position in range(df.shape[1]):
+            values, column_description = encode_values(df.iloc[:, position])
+            if values is None:
+                return False
+            data[str(position)] = values
+            columns.append(column_description)
+
+        index_description = {'name': df.index.name}
+        if isinstance(df.index, pd.RangeIndex):
+            index_description['range'] = [df.index.start, df.index.stop, df.index.step]
+        else:
+            values, index_values_description = encode_values(pd.Series(df.index))
+            if values is None:
+                return False
+            data['index'] = values
+            index_description.update(index_values_description)
+
+        description = {
+            'labels': [list(label) if isinstance(label, tuple) else label for label in df.columns],
+            'label_names': list(df.columns.names),
+            'multi_index': isinstance(df.columns, pd.MultiIndex),
+            'columns': columns,
+            'index': index_description,
+        }
+        try:
+            description = json.dumps(description)
+        except TypeError:
+            return False  # column labels json cannot hold
+
+        pd.DataFrame(data, index=pd.RangeIndex(len(df))).to_parquet(self.path(key), index=False)
+        with open(self.description_path(key), 'w') as f:
+            f.write(description)
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Method to remove the least recently used entries until the cache fits into max_bytes again.
+        The most recent entry is always kept.
+        """
+        entries = sorted(self.cache_dir.glob('*.parquet'), key=lambda f: f.stat().st_mtime)
+        sizes = [self.entry_size(f) for f in entries]
+        total = sum(sizes)
+        for f, size in zip(entries[:-1], sizes):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            self.remove(f.stem)
+
+    def entry_size(self, path):
+        """
+        Helper to obtain the size of an entry on disk, its parquet and json file together
+        """
+        description_path = path.with_suffix('.json')
+        return path.stat().st_size + (description_path.stat().st_size if description_path.exists() else 0)
+
+    def remove(self, key):
+        """
+        Helper to remove the files of an entry
+        """
+        for path in [self.path(key), self.description_path(key)]:
+            if path.exists():
+                path.unlink()
+
+    def clear(self):
+        """
+        Method to remove all entries
+        """
+        for path in self.cache_dir.glob('*.parquet'):
+            self.remove(path.stem)
+
+    def get_or_compute(self, key, compute):
+        """
+        Method to return the cached output or compute and cache it.
+        On a miss the stored file is read back, so the first and all repeated runs return identical frames.
+        :param str key: as it falls out of make_key()
+        :param function compute: Function without arguments that computes the output
+        :return DataFrame: the output
+        """
+        result = self.load(key)
+        if result is None:
+            result = compute()
+            if self.store(key, result):
+                result = self.load(key)
+        return result
+
+    def process_user_input(self, processor, structure=None, completed_only=True, at_least_answer=None,
+                           fill_na=True, string_storage=None):
+        """
+        Cached version of processor.process_user_input()
+        :param SurveyProcessor processor: The processor
+        :param str structure: Survey Structure (content of the .lss file), see make_key()
+        :return DataFrame: the processed data
+        """
+        key = self.make_key(processor, 'process_user_input', structure, completed_only=completed_only,
+                            at_least_answer=at_least_answer, fill_na=fill_na, string_storage=string_storage)
+        return self.get_or_compute(key, lambda: processor.process_user_input(completed_only, at_least_answer,
+                                                                             fill_na,
+                                                                             string_storage=string_storage))
+
+    def make_answer_code_to_text_mapping_df(self, processor, structure=None, a_code=True):
+        """
+        Cached version of processor.make_answer_code_to_text_mapping_df()
+        :param SurveyProcessor processor: The processor
+        :param str structure: Survey Structure (content of the .lss file), see make_key()
+        :return DataFrame: the mapping
+        """
+        key = self.make_key(processor, 'make_answer_code_to_text_mapping_df', structure, a_code=a_code)
+        return self.get_or_compute(key, lambda: processor.make_answer_code_to_text_mapping_df(a_code))
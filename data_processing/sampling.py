@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+
+def get_sample_size(population, n=None, frac=None):
+    """
+    Helper to turn n or frac into the number of participants to draw
+    :param int population: number of participants to draw from
+    :param int n: number of participants
+    :param float frac: share of the participants
+    :return int: the sample size, at most population
+    """
+    if (n is None) == (frac is None):
+        raise Exception('Exactly one of n and frac has to be given.', (n, frac))
+    if frac is not None:
+        n = int(round(frac * population))
+    return min(n, population)
+
+
+def allocate_sample(group_sizes, size):
+    """
+    Helper to split a sample size over groups in proportion to their sizes (largest remainder method), so the
+    parts add up to exactly size. If size allows it, every group gets at least one participant first and the rest
+    is split in proportion to the remaining members.
+    :param ndarray group_sizes: number of participants per group
+    :param int size: the sample size, at most the sum of group_sizes
+    :return ndarray: number of participants to draw per group
+    """
+    group_sizes = np.asarray(group_sizes, dtype=np.int64)
+    allocation = np.zeros(len(group_sizes), dtype=np.int64)
+    if size >= len(group_sizes):
+        allocation += 1
+    capacity = group_sizes - allocation
+    rest = size - allocation.sum()
+    if rest == 0:
+        return allocation
+
+    quotas = rest * capacity / capacity.sum()
+    shares = np.floor(quotas).astype(np.int64)
+    allocation += shares
+
+    # the participants left over go to the groups with the largest remainders that still have members to draw
+    left_over = rest - shares.sum()
+    for group in np.argsort(-(quotas - shares), kind='stable'):
+        if left_over == 0:
+            break
+        if allocation[group] < group_sizes[group]:
+            allocation[group] += 1
+            left_over -= 1
+    return allocation
+
+
+def sample_uniform(data_df, n=None, frac=None, random_state=0):
+    """
+    Draws a simple random sample of the participants
+    :param DataFrame data_df: raw survey data
+    :param int n: number of participants to draw
+    :param float frac: share of the participants to draw (instead of n)
+    :param int random_state: seed, the same seed gives the same sample
+    :return: the sampled rows (in their original order) and a Series with the weight of every row, i.e. the
+        number of participants it stands for
+    """
+    size = get_sample_size(len(data_df), n, frac)
+    rng = np.random.default_rng(random_state)
+    positions = np.sort(rng.choice(len(data_df), size=size, replace=False))
+
+    sample_df = data_df.iloc[positions]
+    weights = pd.Series(len(data_df) / max(size, 1), index=sample_df.index, name='weight')
+    return sample_df, weights
+
+
+def sample_stratified(data_df, column, n=None, frac=None, random_state=0):
+    """
+    Draws a random sample of exactly n (or frac) participants in which every answer of column is represented in
+    proportion to its share of all participants, see allocate_sample(). As long as n is at least the number of
+    answers, every answer keeps at least one participant, so small groups (e.g. a rare start language) are not
+    lost. With a smaller n, the smallest groups can be left out.
+    :param DataFrame data_df: raw survey data
+    :param string column: the column to stratify by, e.g. startlanguage or DEM1 (missing answers form their own group)
+    :param int n: number of participants to draw in total
+    :param float frac: share of the participants to draw (instead of n)
+    :param int random_state: seed, the same seed gives the same sample
+    :return: the sampled rows (in their original order) and a Series with the weight of every row, i.e. the
+        number of participants of its group it stands for
+    """
+    size = get_sample_size(len(data_df), n, frac)
+    rng = np.random.default_rng(random_state)
+
+    # number of the group of every participant, in order of first appearance
+    values = pd.Series(data_df[column].to_numpy(dtype=object))
+    strata = values.groupby(values, dropna=False, sort=False).ngroup().to_numpy()
+
+    stratum_sizes = np.bincount(strata) if len(strata) else np.array([], dtype=np.int64)
+    allocation = allocate_sample(stratum_sizes, size)
+
+    positions = []
+    weights = []
+    for stratum, stratum_size in enumerate(allocation):
+        if stratum_size == 0:
+            continue
+        members = np.flatnonzero(strata == stratum)
+        positions.append(rng.choice(members, size=stratum_size, replace=False))
+        weights.append(np.full(stratum_size, len(members) / stratum_size))
+
+    positions = np.concatenate(positions) if positions else np.array([], dtype=int)
+    weights = np.concatenate(weights) if weights else np.array([])
+    order = np.argsort(positions)
+
+    sample_df = data_df.iloc[positions[order]]
+    return sample_df, pd.Series(weights[order], index=sample_df.index, name='weight')
+
+
+def sample_reservoir(chunks, n, random_state=0, filter_function=None):
+    """
+    Draws a simple random sample of n participants from a stream of responses without holding more than
+    n participants and one chunk in memory. Every participant gets a random key and the n smallest keys
+    are kept. The keys are drawn in the order of the participants, so the sample does not depend on
+    how the stream is split into chunks.
+    :param iterable chunks: DataFrames with raw survey data, e.g. pd.read_csv(..., chunksize=1000)
+    :param int n: number of participants to draw
+    :param int random_state: seed, the same seed gives the same sample
+    :param function filter_function: applied to every chunk before sampling, e.g. to keep completed responses only
+    :return: the sampled rows (in the order of the stream) and a Series with the weight of every row, i.e. the
+        number of participants it stands for
+    """
+    rng = np.random.default_rng(random_state)
+    reservoir = None
+    keys = np.array([])
+    seen = 0
+
+    for chunk in chunks:
+        if filter_function is not None:
+            chunk = filter_function(chunk)
+        candidate_keys = rng.random(len(chunk))
+
+        # a running number keeps the order of the stream
+        candidates = chunk.assign(_position=np.arange(seen, seen + len(chunk)))
+        seen += len(chunk)
+        if reservoir is not None:
+            candidates = pd.concat([reservoir, candidates])
+            candidate_keys = np.concatenate([keys, candidate_keys])
+
+        kept = np.argsort(candidate_keys, kind='stable')[:n]
+        reservoir = candidates.iloc[kept]
+        keys = candidate_keys[kept]
+
+    if reservoir is None:
+        raise Exception('The stream of responses is empty.')
+
+    reservoir = reservoir.sort_values('_position').drop(columns='_position')
+    weights = pd.Series(seen / max(len(reservoir), 1), index=reservoir.index, name='weight')
+    return reservoir, weights
@@ -0,0 +1,127 @@
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from data_processing.processor import FREE_TEXT_QUESTION_TYPES, clean_text
+
+# a term is a run of letters/digits, compared in lower case
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class FreeTextProcessor():
+    """
+    A class to clean the free text answers, comments and other fields of the processed data and count the terms
+    in them. Every distinct text is only cleaned and tokenized once and kept in a cache, so running the pipeline
+    again on a new download only works on the answers that changed.
+    """
+
+    def __init__(self, question_mapping_df, batch_size=1000):
+        """
+        Initialization
+        :param DataFrame question_mapping_df: A df holding a mapping from question code to corresponding type and text,
+            as it falls out of SurveyProcessor.create_question_overview_df()
+        :param int batch_size: Number of texts that are cleaned in one go
+        """
+        self.question_mapping_df = question_mapping_df
+        self.batch_size = batch_size
+
+        self.clean_cache = {}  # raw text -> clean text
+        self.term_cache = {}  # raw text -> Counter of the terms
+
+    def get_text_columns(self, user_output):
+        """
+        Method to find all columns with entered text: the 'a' subcolumn of free text questions
+        and the comment and other fields.
+        :param DataFrame user_output: processed data as it falls out of SurveyProcessor.process_user_input()
+        :return dict: {column: name of the field}, the name is the question code or the comment/other field
+        """
+        question_types = self.question_mapping_df.loc['Question Type']
+
+        columns = {}
+        for code, version in user_output.columns:
+            if '[' in version:  # comment and other fields, e.g. (IMP3[SQ001], IMP3[SQ001comment])
+                columns[(code, version)] = version
+            elif version == 'a' and question_types.get(code) in FREE_TEXT_QUESTION_TYPES:
+                columns[(code, version)] = code
+        return columns
+
+    def update_cache(self, texts):
+        """
+        Method to clean and tokenize all texts that are not in the cache yet, in batches
+        :param iterable of str texts: the raw texts
+        """
+        new_texts = [text for text in pd.unique(np.asarray(texts, dtype=object)) if text not in self.clean_cache]
+
+        for start in range(0, len(new_texts), self.batch_size):
+            batch = new_texts[start:start + self.batch_size]
+            cleaned = [clean_text(text) for text in batch]
+            terms = [Counter(TOKEN_PATTERN.findall(text.lower())) for text in cleaned]
+            self.clean_cache.update(zip(batch, cleaned))
+            self.term_cache.update(zip(batch, terms))
+
+    def collect_texts(self, user_output, columns):
+        """
+        Helper to gather the non empty cells of all text columns
+        :return dict: {column: (row positions, texts)} for the non empty cells of every column
+        """
+        texts = {}
+        for column in columns:
+            values = user_output[column].to_numpy(dtype=object)
+            positions = np.flatnonzero(pd.notna(values))
+            texts[column] = (positions, values[positions].astype(str))
+        return texts
+
+    def clean(self, user_output):
+        """
+        Method to clean all text columns from LimeSurvey's HTML and CSS formatting
+        :param DataFrame user_output: processed data as it falls out of SurveyProcessor.process_user_input()
+        :return DataFrame: a copy of the data with the cleaned texts, string columns (e.g. Arrow-backed) keep
+            their dtype
+        """
+        columns = self.get_text_columns(user_output)
+        texts = self.collect_texts(user_output, columns)
+        self.update_cache([text for _, values in texts.values() for text in values])
+
+        result = user_output.copy()
+        for column, (positions, values) in texts.items():
+            if len(positions) == 0:
+                continue  # nothing to clean, the column stays as it is
+            cleaned = result[column].to_numpy(dtype=object, copy=True)
+            cleaned[positions] = [self.clean_cache[text] for text in values]
+            # string columns (e.g. Arrow-backed) stay string columns, the others hold the texts as objects
+            if isinstance(user_output[column].dtype, pd.StringDtype):
+                cleaned = pd.array(cleaned, dtype=user_output[column].dtype)
+            result[column] = cleaned
+        return result
+
+    def make_term_frequency_matrix(self, user_output):
+        """
+        Method to count the terms of all text columns in one pass. Every field has its own vocabulary, so
+        'privacy' in FT1 and in FT2 are different columns of the matrix.
+        :param DataFrame user_output: processed data as it falls out of SurveyProcessor.process_user_input()
+        :return: sparse (participants x terms) matrix in the row order of user_output and
+            a dict {field: {term: column in the matrix}} with the vocabulary of every field
+        """
+        columns = self.get_text_columns(user_output)
+        texts = self.collect_texts(user_output, columns)
+        self.update_cache([text for _, values in texts.values() for text in values])
+
+        rows, cols, counts = [], [], []
+        vocabularies = {}
+        n_terms = 0
+        for column, (positions, values) in texts.items():
+            vocabulary = vocabularies.setdefault(columns[column], {})
+            for row, text in zip(positions, values):
+                for term, count in self.term_cache[text].items():
+                    if term not in vocabulary:
+                        vocabulary[term] = n_terms
+                        n_terms += 1
+                    rows.append(row)
+                    cols.append(vocabulary[term])
+                    counts.append(count)
+
+        matrix = csr_matrix((counts, (rows, cols)), shape=(len(user_output), n_terms), dtype=np.int32)
+        return matrix, vocabularies
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_extension_array_dtype, union_categoricals
+
+
+class WaveMerger():
+    """
+    A class to combine the processed data of several waves (or language variants) of a questionnaire.
+    The waves are aligned by their (question code, version) columns: a question that a wave did not ask is missing
+    for the participants of that wave. Adding a wave only keeps references to its columns, the combined frame is
+    built in one go by merge().
+    """
+
+    def __init__(self):
+        self.waves = []  # names of the waves in the order they were added
+        self.wave_sizes = []
+        self.indices = []
+        self.columns = {}  # (code, version) -> [(position of the wave, values), ...] in order of first appearance
+        self.merged_df = None
+
+    def add_wave(self, name, user_output):
+        """
+        Method to add the data of a wave
+        :param str name: name of the wave, it goes into the wave column
+        :param DataFrame user_output: processed data as it falls out of SurveyProcessor.process_user_input()
+        """
+        if name in self.waves:
+            raise Exception('There is already a wave with this name.', name)
+
+        position = len(self.waves)
+        self.waves.append(name)
+        self.wave_sizes.append(len(user_output))
+        self.indices.append(user_output.index)
+        for column in user_output.columns:
+            values = user_output[column]
+            # numpy backed columns as ndarray, the others (categorical, nullable, ...) as their extension array
+            values = values.array if is_extension_array_dtype(values.dtype) else values.to_numpy()
+            self.columns.setdefault(column, []).append((position, values))
+
+        self.merged_df = None
+
+    def coverage(self):
+        """
+        Method to obtain which question codes each wave covered
+        :return DataFrame: boolean table with the question codes as index and the waves as columns
+        """
+        covered = {}
+        for (code, version), chunks in self.columns.items():
+            if version == '':
+                continue  # metadata
+            positions = covered.setdefault(code, set())
+            positions.update(position for position, _ in chunks)
+
+        table = np.zeros((len(covered), len(self.waves)), dtype=bool)
+        for i, positions in enumerate(covered.values()):
+            table[i, list(positions)] = True
+        return pd.DataFrame(table, index=list(covered.keys()), columns=self.waves)
+
+    def combine_column(self, chunks):
+        """
+        Helper to build one column of the combined data. The result is allocated once and the waves are copied into
+        it. The dtype is only widened as far as needed: e.g. integers become float only if a wave lacks the column.
+        :param list chunks: [(position of the wave, values), ...]
+        :return: array with the values of all waves
+        """
+        present = dict(chunks)
+        missing = len(present) < len(self.waves)
+        dtypes = {values.dtype for values in present.values()}
+        dtype = dtypes.pop() if len(dtypes) == 1 else None
+
+        # categories are merged instead of falling back to object
+        if all(isinstance(values.dtype, pd.CategoricalDtype) for values in present.values()):
+            parts = [present[p] if p in present else pd.Categorical([None] * size)
+                     for p, size in enumerate(self.wave_sizes)]
+            return union_categoricals(parts, ignore_order=True)
+
+        # extension dtypes (nullable integers, strings, ...) have their own missing value
+        if dtype is not None and is_extension_array_dtype(dtype):
+            parts = [pd.Series(present[p]) if p in present else pd.Series([None] * size, dtype=dtype)
+                     for p, size in enumerate(self.wave_sizes)]
+            return pd.concat(parts, ignore_index=True).array
+
+        numpy_dtypes = [values.dtype for values in present.values() if not is_extension_array_dtype(values.dtype)]
+        if len(numpy_dtypes) == len(present) and all(d.kind in 'biuf' for d in numpy_dtypes):
+            target = np.result_type(*numpy_dtypes)
+            if missing:
+                target = np.result_type(target, np.float64)
+            fill = np.nan
+        elif dtype is not None and np.dtype(dtype).kind in 'mM':
+            target = dtype
+            fill = np.datetime64('NaT')
+        else:
+            target = np.dtype(object)
+            fill = np.nan
+
+        result = np.empty(sum(self.wave_sizes), dtype=target)
+        start = 0
+        for position, size in enumerate(self.wave_sizes):
+            if position in present:
+                values = present[position]
+                if target == object and values.dtype != object:
+                    # through pandas, numpy would turn datetime64[ns] into plain integers
+                    values = pd.Series(values).astype(object).to_numpy()
+                result[start:start + size] = np.asarray(values, dtype=target)
+            else:
+                result[start:start + size] = fill
+            start += size
+        return result
+
+    def merge(self):
+        """
+        Method to combine all waves. The result is kept until the next wave is added.
+        :return DataFrame: the data of all waves with a wave column in front, the columns of all waves
+            in order of their first appearance and the participant ids as index
+        """
+        if self.merged_df is not None:
+            return self.merged_df
+        if not self.waves:
+            raise Exception('There are no waves to merge.')
+
+        data = {('wave', ''): pd.Categorical(np.repeat(self.waves, self.wave_sizes), categories=self.waves)}
+        for column, chunks in self.columns.items():
+            data[column] = self.combine_column(chunks)
+
+        index = self.indices[0].append(self.indices[1:]) if len(self.indices) > 1 else self.indices[0]
+        merged = pd.DataFrame(data, index=index)
+        merged.index.name = 'id'
+
+        self.merged_df = merged
+        return merged
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+
+class FrequencyCube():
+    """
+    A summary of the processed data for charts that are drawn again and again (e.g. with different filters):
+    how often every answer was given per question and, for a set of grouping questions, how often it was given
+    together with every answer of the grouping question. The Plotter can draw its countplots from the cube
+    instead of counting the rows every time.
+    The cube is filled by update(), which can be called again when new responses arrive. Participants that
+    were already counted are skipped, so a new download that still contains the old responses can be passed as is.
+    A participant whose answers changed since (e.g. an incomplete response that was completed later) is counted
+    again with the new answers. For this, the cube keeps the counted rows of the selected columns.
+    Participants are told apart by their ID, Lime Survey starts the IDs at 1 in every survey, so for several waves
+    the wave column has to be given as key column.
+    """
+
+    def __init__(self, group_by=None, columns=None, version='a_text', key_columns=None):
+        """
+        Initialization
+        :param list of strings group_by: The columns (question codes or metadata like startlanguage) to split the
+            counts by
+        :param list of strings columns: The columns to count, None for all
+        :param string version: The subcolumn of the processed data that is counted ('a_text', 'a_code' or 'a'),
+            the metadata columns are always included
+        :param list of strings key_columns: The columns that identify a participant together with the ID,
+            e.g. ['wave'] for the output of the WaveMerger
+        """
+        self.group_by = list(group_by or [])
+        self.columns = columns
+        self.version = version
+        self.key_columns = list(key_columns or [])
+
+        self.rows = None  # the counted rows, with the participant keys as index
+        self.row_hashes = None  # hash of every counted row, to find the ones that changed
+        self.counts = {}  # column -> Series with the count per answer
+        self.grouped_counts = {}  # (column, group column) -> DataFrame with the answers as index and the group as columns
+
+    def select(self, df):
+        """
+        Helper to bring the data into one column per question
+        :param DataFrame df: processed data (2-level header) or data with one column per question,
+            as it is passed to the Plotter
+        :return DataFrame: with the question codes as columns
+        """
+        if isinstance(df.columns, pd.MultiIndex):
+            versions = df.columns.get_level_values(1)
+            df = df.loc[:, (versions == self.version) | (versions == '')]
+            df.columns = df.columns.get_level_values(0)
+
+        if self.columns is not None:
+            df = df[[column for column in df.columns
+                     if column in self.columns or column in self.group_by or column in self.key_columns]]
+        return df
+
+    def make_keys(self, df):
+        """
+        Helper to identify the participants by their ID and the key columns
+        :param DataFrame df: data with one column per question, see select()
+        :return Index: one key per row
+        """
+        missing_keys = [column for column in self.key_columns if column not in df.columns]
+        if missing_keys:
+            raise Exception('The key columns are not in the data.', missing_keys)
+        if not self.key_columns:
+            keys = df.index
+        else:
+            keys = pd.MultiIndex.from_arrays([df[column] for column in self.key_columns] + [df.index])
+        if keys.has_duplicates:
+            raise Exception('Participants occur more than once, several waves need a key column (e.g. wave).',
+                            keys[keys.duplicated()].unique().tolist())
+        return keys
+
+    def update(self, df):
+        """
+        Method to add the counts of new responses and of responses that changed since they were counted
+        :param DataFrame df: processed data with the participant IDs as index, see select()
+        """
+        df = self.select(df)
+        df = df.set_axis(self.make_keys(df), axis=0)
+        hashes = pd.util.hash_pandas_object(df, index=False)
+
+        if self.rows is not None:
+            known = df.index.isin(self.rows.index)
+            changed = df.index[known][hashes[known].to_numpy() != self.row_hashes.loc[df.index[known]].to_numpy()]
+            # the old answers of changed responses are taken out again
+            self.count(self.rows.loc[changed], -1)
+            self.rows = self.rows.drop(changed)
+            self.row_hashes = self.row_hashes.drop(changed)
+            df = df[~known | df.index.isin(changed)]
+            hashes = hashes.loc[df.index]
+
+        self.count(df, 1)
+        self.rows = df if self.rows is None else pd.concat([self.rows, df])
+        self.row_hashes = hashes if self.row_hashes is None else pd.concat([self.row_hashes, hashes])
+
+    def count(self, df, sign):
+        """
+        Helper to add (sign 1) or take out (sign -1) the counts of rows, all columns and groups are counted
+        in one pass over the data
+        :param DataFrame df: data with one column per question, see select()
+        :param int sign: 1 or -1
+        """
+        # the answers are turned into integer codes (-1 for missing) once per column
+        codes = {}
+        for column in df.columns:
+            codes[column] = pd.factorize(df[column].to_numpy(dtype=object))
+
+        missing_groups = [group for group in self.group_by if group not in codes]
+        if missing_groups:
+            raise Exception('The grouping columns are not in the data.', missing_groups)
+
+        for column, (column_codes, answers) in codes.items():
+            answered = column_codes >= 0
+            counts = np.bincount(column_codes[answered], minlength=len(answers))
+            self.add(self.counts, column, pd.Series(sign * counts, index=answers))
+
+            for group in self.group_by:
+                if group == column:
+                    continue
+                group_codes, group_answers = codes[group]
+                both = answered & (group_codes >= 0)
+                # one bin per (answer, group answer) combination
+                cells = np.bincount(column_codes[both] * len(group_answers) + group_codes[both],
+                                    minlength=len(answers) * len(group_answers))
+                table = pd.DataFrame(cells.reshape(len(answers), len(group_answers)),
+                                     index=answers, columns=group_answers)
+                self.add(self.grouped_counts, (column, group), sign * table)
+
+    def add(self, store, key, counts):
+        """
+        Helper to add new counts to the ones in the cube
+        """
+        if key in store:
+            counts = store[key].add(counts, fill_value=0).astype(np.int64)
+            if isinstance(counts, pd.Series):
+                counts = counts[counts != 0]  # answers whose only participants were taken out again
+        store[key] = counts
+
+    def get_counts(self, column, group=None, values=None):
+        """
+        Method to obtain how often every answer was given
+        :param string column: The question code
+        :param string group: A grouping column to filter by, None for all participants
+        :param list values: The answers of the grouping column to keep
+        :return Series: with the count per answer
+        """
+        if group is None:
+            if column not in self.counts:
+                raise Exception('The cube has no counts for this column.', column)
+            return self.counts[column]
+
+        table = self.get_grouped_counts(column, group)
+        if values is not None:
+            table = table.reindex(columns=values, fill_value=0)
+        return table.sum(axis=1)
+
+    def get_grouped_counts(self, column, group):
+        """
+        Method to obtain how often every answer was given together with every answer of a grouping column
+        :param string column: The question code
+        :param string group: The grouping column, it has to be in group_by
+        :return DataFrame: with the answers of column as index and the answers of group as columns
+        """
+        if (column, group) not in self.grouped_counts:
+            raise Exception('The cube has no counts for this pair of columns.', (column, group))
+        return self.grouped_counts[(column, group)]
@@ -6,6 +6,9 @@ import numpy as np
 
 from textwrap import wrap
 
+from data_processing.memory_tracker import tracked
+from data_visualization.frequency_cube import FrequencyCube
+
 plt.rcParams['figure.figsize'] = (10, 6)  # set parameters for the plots
 
 
@@ -14,15 +17,17 @@ class Plotter():
     A class to create python plots for given data.
     """
 
-    def __init__(self, answer_mapping_df, question_mapping_df):
+    def __init__(self, answer_mapping_df, question_mapping_df, memory_tracker=None):
         """
         Initialization
         :param DataFrame answer_mapping_df: A df holding a mapping from answer codes to all possible text
                 answers per question.
         :param DataFrame question_mapping_df: A df holding a mapping from question code to corresponding type and text.
+        :param MemoryTracker memory_tracker: If given, the memory used by the plotting methods is recorded
         """
         self.answer_mapping_df = answer_mapping_df
         self.question_mapping_df = question_mapping_df
+        self.memory_tracker = memory_tracker
 
     def obtain_labels(self, col_name, line_break=True):
         """
@@ -57,11 +62,13 @@ class Plotter():
 
         return dicc
 
+    @tracked
     def make_countplot(self, df, x_name, title="", x_axlabel="", x_labels=[], labels_newline=True, ax=None):
         """
         Method to create a countplot for the property of x_name
         :param DataFrame df: contains the data to be plotted (so filtering should take place outside the method)
-                         the dataframe column names should contain the x_name
+                         the dataframe column names should contain the x_name.
+                         A FrequencyCube can be given instead, then the bars are drawn from its counts
         :param string x_name: name of the column to plot on the x-axis
         :param string title: Title of the plot
         :param string x_axlabel: Subtitle of the x-axis
@@ -69,6 +76,19 @@ class Plotter():
         :param bool labels_newline: If the labels that we provide in x_labels or y_labels contain linebreaks
         :return: Axis of plot
         """
+        if isinstance(df, FrequencyCube):
+            counts = df.get_counts(x_name)
+            # if labels have a new line, the answers in the cube need them too
+            if labels_newline:
+                counts = counts.rename(index=self.make_mapping_from_labels(x_labels))
+            data = counts.rename_axis(x_name).reset_index(name='count')
+            ax = sns.barplot(x=x_name, y='count', data=data, order=x_labels or None, ax=ax).set_title(title,
+                                                                                                     fontsize=18)
+            plt.xticks(rotation=70)
+            if x_axlabel:
+                plt.xlabel(x_axlabel)
+            return ax
+
         # if labels have a new line, we need to match them over the labels in the dataframe given
         if labels_newline:
             d1 = self.make_mapping_from_labels(x_labels)
@@ -86,12 +106,15 @@ class Plotter():
 
         return ax
 
+    @tracked
     def make_grouped_countplot(self, df, x_name, y_name, title="", x_axlabel="", y_axlabel="", x_labels=[], y_labels=[],
                                labels_newline=True,ax=None):
         """
         Method to create a countplot for the two properties given for x and y
         :param DataFrame df: contains the data to be plotted (so filtering should take place outside the method)
-                         the dataframe column names should contain the names specified in the following 2 params
+                         the dataframe column names should contain the names specified in the following 2 params.
+                         A FrequencyCube that is grouped by y_name can be given instead, then the bars are drawn
+                         from its counts
         :param string x_name: name of the column to plot on the x-axis
         :param string y_name: name of the column to plot on as groups (each has a different color)
         :param string title: Title of the plot
@@ -102,16 +125,26 @@ class Plotter():
         :param bool labels_newline: If the labels that we provide in x_labels or y_labels contain linebreaks
         :return: Axis of plot
         """
-        # if labels have a new line, we need to match them over the labels in the dataframe given
-        # otherwise, they are not put to the correct bin of the diagram (because the plotting function maps over names)
-        if labels_newline:
-            d1 = self.make_mapping_from_labels(x_labels)
-            d2 = self.make_mapping_from_labels(y_labels)
-            d = {**d1, **d2}
-            df = df.replace(d)
+        if isinstance(df, FrequencyCube):
+            table = df.get_grouped_counts(x_name, y_name)
+            # if labels have a new line, the answers in the cube need them too
+            if labels_newline:
+                table = table.rename(index=self.make_mapping_from_labels(x_labels),
+                                     columns=self.make_mapping_from_labels(y_labels))
+            data = table.rename_axis(index=x_name, columns=y_name).stack().reset_index(name='count')
+            ax = sns.barplot(x=x_name, y='count', hue=y_name, data=data, order=x_labels or None,
+                             hue_order=y_labels or None, ax=ax).set_title(title, fontsize=18)
+        else:
+            # if labels have a new line, we need to match them over the labels in the dataframe given
+            # otherwise, they are not put to the correct bin of the diagram (because the plotting function maps over names)
+            if labels_newline:
+                d1 = self.make_mapping_from_labels(x_labels)
+                d2 = self.make_mapping_from_labels(y_labels)
+                d = {**d1, **d2}
+                df = df.replace(d)
 
-        ax = sns.countplot(x=x_name, hue=y_name, data=df, order=x_labels, hue_order=y_labels, ax=ax).set_title(title,
-                                                                                                        fontsize=18)
+            ax = sns.countplot(x=x_name, hue=y_name, data=df, order=x_labels, hue_order=y_labels,
+                               ax=ax).set_title(title, fontsize=18)
         plt.xticks(rotation=70)
 
         # if user wants to set axis labels manually
@@ -121,6 +154,7 @@ class Plotter():
             plt.ylabel(y_axlabel)
         return ax
 
+    @tracked
     def make_crosstable(self, df, x_name, y_name, x_labels, y_labels, relative_frequencies=False, labels_newline=True):
         """
         Function to create a crosstable plotting two properties of the data against each other.
@@ -179,6 +213,7 @@ class Plotter():
 
         return df_new
 
+    @tracked
     def make_heatmap(self, df_cross, title="", annot=False):
         """
         This method gets a contingency table and plots it as a heatmap
@@ -190,6 +225,7 @@ class Plotter():
         ax = sns.heatmap(df_cross, annot=annot).set_title(title, fontsize=18)
         return ax
 
+    @tracked
     def make_mosaic_plot(self, df, x_name, y_name, title="", annot=False):
         """
         :param DataFrame df: contains the data to be plotted (so filtering should take place outside the method)
@@ -211,6 +247,7 @@ class Plotter():
         plt.xticks(rotation=70)
         return ax
 
+    @tracked
     def make_boxplots(self, df, x_name, y_name, title="", x_axlabel="", y_axlabel="", x_labels=[], y_labels=[],
                       labels_newline=True):
         """